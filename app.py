@@ -1,17 +1,16 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-import os
-import json
 import datetime
-import uuid
+import bisect
+import queue
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from plantbot_core import StorageManager, HistoryIndex, AIModel, ModelCache, FormulationOptimizer, INPUT_RANGES, radar_profile, PERF
 
 # --- VISUALIZATION LIBRARY ---
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+# matplotlib (and its Tk backend) is imported on the first chart, not at start-up
 
 # --- 🎨 PRO PALETTE ---
 COLORS = {
@@ -29,164 +28,342 @@ COLORS = {
 # 1. VISUALIZATION ENGINE
 # ==========================================
 class VisualizationManager:
-    def create_radar_chart(self, parent_frame, data_dict):
-        for widget in parent_frame.winfo_children(): widget.destroy()
-        
-        labels = list(data_dict.keys())
-        stats = list(data_dict.values())
-        stats = np.concatenate((stats,[stats[0]]))
-        angles = np.linspace(0, 2*np.pi, len(labels), endpoint=False)
-        angles = np.concatenate((angles,[angles[0]]))
-
-        fig = plt.figure(figsize=(4, 4), facecolor=COLORS["white"])
-        ax = fig.add_subplot(111, polar=True)
-        ax.plot(angles, stats, 'o-', linewidth=2, color=COLORS["dark_brown"])
-        ax.fill(angles, stats, alpha=0.25, color=COLORS["green_accent"])
-        ax.set_thetagrids(angles[:-1] * 180/np.pi, labels, fontsize=8)
+    # One persistent Figure/canvas per chart frame. Polar axes and grid are built once; each update
+    # only moves line/fill vertices from a small artist pool and asks Tk for a draw_idle.
+    SERIES_COLORS = [COLORS["dark_brown"], COLORS["red_soft"], COLORS["green_accent"], COLORS["beige_dark"], COLORS["peach"]]
+
+    def __init__(self):
+        self.parent = None
+        self.labels = None
+        self.fig = None
+        self.ax = None
+        self.canvas = None
+        self.series = []  # pooled (line, fill) artists, hidden when unused
+
+    def _ensure(self, parent_frame, labels):
+        if self.canvas is not None and self.parent is parent_frame and self.labels == labels: return
+        if self.parent is not parent_frame:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            for widget in parent_frame.winfo_children(): widget.destroy()
+            self.fig = Figure(figsize=(4, 4), facecolor=COLORS["white"])
+            self.canvas = FigureCanvasTkAgg(self.fig, master=parent_frame)
+            self.canvas.get_tk_widget().pack(fill='both', expand=True)
+            self.parent = parent_frame
+        self.fig.clear()
+        self.labels = labels
+        self.angles = np.linspace(0, 2*np.pi, len(labels), endpoint=False)
+        self.angles = np.concatenate((self.angles,[self.angles[0]]))
+
+        ax = self.fig.add_subplot(111, polar=True)
+        self.fig.subplots_adjust(bottom=0.16)  # room for the comparison legend
+        ax.set_thetagrids(self.angles[:-1] * 180/np.pi, labels, fontsize=8)
         ax.set_facecolor(COLORS["off_white"])
         ax.spines['polar'].set_visible(False)
+        ax.set_ylim(0, 100)
         ax.set_yticklabels([])
         ax.grid(True, color=COLORS["beige_dark"], linestyle='--')
+        self.ax = ax
+        self.series = []
+        self.legend = None
+
+    def _artists(self, i):
+        while len(self.series) <= i:
+            color = self.SERIES_COLORS[len(self.series) % len(self.SERIES_COLORS)]
+            line, = self.ax.plot([], [], 'o-', linewidth=2, color=color)
+            fill, = self.ax.fill([0], [0], alpha=0.25, color=COLORS["green_accent"] if not self.series else color)
+            self.series.append((line, fill))
+        return self.series[i]
+
+    def show(self, parent_frame, series):
+        # series: list of (label, data_dict) sharing the same axis labels
+        self._ensure(parent_frame, list(series[0][1].keys()))
+        for i, (_, data_dict) in enumerate(series):
+            stats = np.array([data_dict[k] for k in self.labels], dtype=float)
+            stats = np.concatenate((stats,[stats[0]]))
+            line, fill = self._artists(i)
+            line.set_data(self.angles, stats)
+            fill.set_xy(np.column_stack((self.angles, stats)))
+            line.set_label(series[i][0])
+            line.set_visible(True)
+            fill.set_visible(True)
+        for line, fill in self.series[len(series):]:
+            line.set_visible(False)
+            fill.set_visible(False)
+        if self.legend is not None: self.legend.remove()
+        self.legend = None
+        if len(series) > 1:
+            self.legend = self.fig.legend(handles=[self.series[i][0] for i in range(len(series))], loc='lower center', ncol=min(3, len(series)), fontsize=7, frameon=False)
+        self.canvas.draw_idle()
+
+    @PERF.timed("ui.create_radar_chart")
+    def create_radar_chart(self, parent_frame, data_dict):
+        self.show(parent_frame, [("", data_dict)])
 
-        canvas = FigureCanvasTkAgg(fig, master=parent_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
+    @PERF.timed("ui.overlay_radar_chart")
+    def overlay_radar_chart(self, parent_frame, labelled):
+        # Side-by-side comparison: each (label, data_dict) becomes one outline on the same axes
+        self.show(parent_frame, labelled)
 
 # ==========================================
-# 2. STORAGE MANAGER
+# 2. BACKGROUND WORKER
 # ==========================================
-class StorageManager:
-    def __init__(self):
-        self.mode = "LOCAL"
-        self.base_path = os.getcwd()
-        self.history_file = "plantbot_history_named.json"
-        self.ingredients_file = "plantbot_ingredients.json"
+class BackgroundWorker:
+    # Runs training and file I/O off the Tk thread. Results and progress are handed back
+    # through a queue that the Tk thread drains with root.after, so widgets are only touched there.
+    # Polling runs only while jobs are pending or callbacks are queued; the next job restarts it.
+    def __init__(self, root, poll_ms=50, on_error=None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_error = on_error  # called on the Tk thread when a posted callback raises
+        self.io_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plantbot-io")  # 1 worker keeps writes ordered
+        self.train_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plantbot-train")
+        self.events = queue.Queue()
+        self.pending = set()  # submitted futures not yet finished
+        self.polling = False
+
+    def post(self, fn, *args):
+        # Safe from any thread while a job is pending: fn(*args) will run on the Tk thread
+        self.events.put((fn, args))
+
+    def run_io(self, fn, *args, on_done=None, on_error=None):
+        return self._submit(self.io_pool, fn, args, on_done, on_error)
+
+    def run_training(self, fn, *args, on_done=None, on_error=None):
+        return self._submit(self.train_pool, fn, args, on_done, on_error)
+
+    def run_compute(self, fn, *args, on_done=None, on_error=None):
+        # CPU-heavy jobs share the training thread rather than competing with it
+        return self._submit(self.train_pool, fn, args, on_done, on_error)
+
+    def _submit(self, pool, fn, args, on_done, on_error):
+        def job():
+            try: result = fn(*args)
+            except Exception as e:
+                if on_error: self.post(on_error, e)
+                return
+            if on_done: self.post(on_done, result)
+        future = pool.submit(job)
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)  # job() has posted its result by then
+        self._ensure_polling()
+        return future
+
+    def _ensure_polling(self):
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        # One failing callback must not stop delivery of the ones queued behind it
+        try:
+            while True:
+                try: fn, args = self.events.get_nowait()
+                except queue.Empty: break
+                try: fn(*args)
+                except Exception as e:
+                    if self.on_error is None or fn == self.on_error: traceback.print_exc()
+                    else:
+                        try: self.on_error(e)
+                        except Exception: traceback.print_exc()
+        finally:
+            if self.pending or not self.events.empty(): self.root.after(self.poll_ms, self._poll)
+            else: self.polling = False  # idle: _submit re-arms on the next job
+
+    def shutdown(self):
+        self.io_pool.shutdown(wait=True)
+        self.train_pool.shutdown(wait=False, cancel_futures=True)
+
+# ==========================================
+# 3. APP UI
+# ==========================================
+class ChatTranscript:
+    # The whole conversation lives in one Text widget: each message is a tagged region with a mark at
+    # its start, instead of a Frame and two Labels. Only the newest max_live messages stay in the
+    # widget; older ones page back in when the view reaches the top. Scrolling to the newest message
+    # is coalesced into a single after_idle per burst of messages.
+    def __init__(self, parent, max_live=200, page=50):
+        self.max_live, self.page = max_live, page
+        self.messages = []  # (sender, text) for the whole session
+        self.first_live = 0  # index of the oldest message currently in the widget
+        self.flush_pending = False
+        self.paging = False
+
+        self.text = tk.Text(parent, wrap='word', bg=COLORS["white"], fg=COLORS["dark_brown"], font=("Helvetica", 10),
+                            relief='flat', bd=0, highlightthickness=0, padx=5, pady=5, cursor='arrow', state='disabled')
+        sb = ttk.Scrollbar(parent, command=self.text.yview)
+        self.text.configure(yscrollcommand=lambda lo, hi: (sb.set(lo, hi), self._on_scroll(lo)))
+        self.text.pack(side="left", fill="both", expand=True)
+        sb.pack(side="right", fill="y")
+        bubble = dict(spacing1=4, spacing2=2, spacing3=4)
+        self.text.tag_configure("Bot", background=COLORS["green_accent"], lmargin1=8, lmargin2=8, rmargin=90, **bubble)
+        self.text.tag_configure("User", background=COLORS["peach"], justify='right', lmargin1=90, lmargin2=90, rmargin=8, **bubble)
+
+    @staticmethod
+    def _body(sender, text):
+        return f"🤖  {text}" if sender == "Bot" else f"{text}  👤"
+
+    def append(self, sender, text):
+        self.messages.append((sender, text))
+        i = len(self.messages) - 1
+        t = self.text
+        t.configure(state='normal')
+        t.mark_set(f"msg{i}", "end-1c")
+        t.mark_gravity(f"msg{i}", "left")
+        t.insert("end", self._body(sender, text), (sender,))
+        t.insert("end", "\n\n")
+        if i + 1 - self.first_live > self.max_live:
+            # Drop the oldest live messages in one delete; they stay in self.messages for paging
+            keep = i + 1 - self.max_live
+            t.delete("1.0", f"msg{keep}")
+            for j in range(self.first_live, keep): t.mark_unset(f"msg{j}")
+            self.first_live = keep
+        t.configure(state='disabled')
+        if not self.flush_pending:
+            self.flush_pending = True
+            t.after_idle(self._flush)
+
+    def _flush(self):
+        self.flush_pending = False
+        self.text.see("end")
+
+    def _on_scroll(self, lo):
+        if float(lo) <= 0.0 and self.first_live > 0 and not self.paging:
+            self.paging = True
+            self.text.after_idle(self._page_in)
+
+    def _page_in(self):
+        # Insert the previous page above the oldest live message and keep that message at the top
+        t = self.text
+        self.paging = False
+        if t.yview()[0] > 0.0 or self.first_live == 0: return  # a new message already scrolled us away
+        anchor = f"msg{self.first_live}"
+        t.configure(state='normal')
+        for j in range(self.first_live - 1, max(0, self.first_live - self.page) - 1, -1):
+            top = f"msg{j + 1}"
+            t.mark_gravity(top, "right")  # let the existing top mark move down past the inserted text
+            sender, text = self.messages[j]
+            t.insert("1.0", self._body(sender, text) + "\n\n", (sender,))
+            t.tag_remove(sender, f"{top} -2c", top)
+            t.mark_gravity(top, "left")
+            t.mark_set(f"msg{j}", "1.0")
+            t.mark_gravity(f"msg{j}", "left")
+            self.first_live = j
+        t.configure(state='disabled')
+        t.yview(anchor)
+
+class HistorySidebar:
+    # Virtualized Experiment Log: only cards inside the visible scroll window exist, drawn from a
+    # reusable pool. Pinned-first/newest-first order lives in a sorted key list that single-record
+    # changes patch with bisect, so a pin or rename never rebuilds or re-sorts the whole list.
+    CARD_H = 70
+
+    def __init__(self, canvas, on_open, on_pin, on_rename, on_delete):
+        self.canvas = canvas
+        self.on_open, self.on_pin, self.on_rename, self.on_delete = on_open, on_pin, on_rename, on_delete
+        self.keys = []  # ascending (pinned, timestamp, id); displayed in reverse
+        self.key_of = {}
+        self.items = {}
+        self.pool = []
+        self.width = 320
+        self.region_n = None
+        canvas.bind("<Configure>", self._on_resize)
+
+    @staticmethod
+    def sort_key(item):
+        return (bool(item.get("pinned", False)), item.get("timestamp", ""), item["id"])
+
+    def load(self, records):
+        self.items = {r["id"]: r for r in records}
+        self.key_of = {rid: self.sort_key(r) for rid, r in self.items.items()}
+        self.keys = sorted(self.key_of.values())
+        self.render()
+
+    def upsert(self, record):
+        rid, new = record["id"], self.sort_key(record)
+        old = self.key_of.get(rid)
+        self.items[rid] = record
+        if old == new:
+            # Same slot: repaint just that card if it is on screen
+            for card in self.pool:
+                if card["id"] == rid: self._bind(card, record)
+            return
+        if old is not None: del self.keys[bisect.bisect_left(self.keys, old)]
+        bisect.insort(self.keys, new)
+        self.key_of[rid] = new
+        self.render()
+
+    def remove(self, rid):
+        old = self.key_of.pop(rid, None)
+        if old is None: return
+        del self.keys[bisect.bisect_left(self.keys, old)]
+        self.items.pop(rid, None)
+        self.render()
+
+    def render(self):
+        n = len(self.keys)
+        if n != self.region_n:
+            self.region_n = n
+            self.canvas.configure(scrollregion=(0, 0, self.width, n * self.CARD_H))
+        first = max(0, int(self.canvas.canvasy(0) // self.CARD_H))
+        last = min(n, first + self.canvas.winfo_height() // self.CARD_H + 2)
+        while len(self.pool) < last - first: self.pool.append(self._make_card())
+        for slot, card in enumerate(self.pool):
+            pos = first + slot
+            if pos < last:
+                self._bind(card, self.items[self.keys[n - 1 - pos][2]])
+                self.canvas.coords(card["win"], 10, pos * self.CARD_H + 5)
+                self.canvas.itemconfigure(card["win"], state="normal")
+            elif card["id"] is not None:
+                card["id"], card["sig"] = None, None
+                self.canvas.itemconfigure(card["win"], state="hidden")
+
+    def _make_card(self):
+        c = tk.Frame(self.canvas, pady=8, padx=8)
+        r1 = tk.Frame(c)
+        r1.pack(fill='x')
+        card = {"frame": c, "row": r1, "id": None, "sig": None}
+        card["score"] = tk.Label(r1, width=3, font=("Arial",9,"bold"))
+        card["score"].pack(side='left')
+        card["name"] = tk.Label(r1, font=("Arial",10,"bold"))
+        card["name"].pack(side='left')
+        
+        # Actions: Rename, Delete, Pin
+        card["del"] = tk.Button(r1, text="🗑️", bd=0, command=lambda: self.on_delete(card["id"]))
+        card["del"].pack(side='right')
+        card["ren"] = tk.Button(r1, text="✏️", bd=0, command=lambda: self.on_rename(card["id"]))
+        card["ren"].pack(side='right')
+        card["pin"] = tk.Button(r1, text="📌", bd=0, command=lambda: self.on_pin(card["id"]))
+        card["pin"].pack(side='right')
         
-    def set_mode(self, mode, path=None):
-        self.mode = mode
-        if path: self.base_path = path
-        if not os.path.exists(self.base_path):
-            try: os.makedirs(self.base_path)
-            except: pass
-
-    def load_ingredients(self):
-        full_path = os.path.join(self.base_path, self.ingredients_file)
-        if not os.path.exists(full_path):
-            defaults = {
-                "Pea": {"whc": 3.0, "solubility": 60, "desc": "Globulin-heavy. Earthy notes. Good gelling."},
-                "Soy": {"whc": 4.5, "solubility": 85, "desc": "The gold standard. High solubility, neutral taste."},
-                "Oat": {"whc": 2.5, "solubility": 40, "desc": "High starch/beta-glucan. Viscous but weak gel."},
-                "Fava": {"whc": 3.5, "solubility": 55, "desc": "High foaming capacity. Can be beany."},
-                "Almond": {"whc": 1.5, "solubility": 20, "desc": "Insoluble particles. Gritty if not refined."}
-            }
-            with open(full_path, 'w') as f: json.dump(defaults, f)
-            return defaults
-        with open(full_path, 'r') as f: return json.load(f)
-
-    def save_ingredient(self, name, data):
-        current = self.load_ingredients()
-        current[name] = data
-        with open(os.path.join(self.base_path, self.ingredients_file), 'w') as f: json.dump(current, f)
-
-    def save_history_item(self, record, custom_name=None):
-        full_path = os.path.join(self.base_path, self.history_file)
-        history = self.get_history()
+        card["info"] = tk.Label(c, fg="#555", font=("Arial", 8))
+        card["info"].pack(anchor='w')
+        c.bind("<Button-1>", lambda e: self.on_open(self.items[card["id"]]))
+        card["win"] = self.canvas.create_window((10, 0), window=c, anchor="nw", width=self.width - 20, height=self.CARD_H - 10)
+        return card
+
+    def _bind(self, card, item):
+        sig = (item["id"], item.get("name"), item['score'], item.get("pinned"), item['conc'], item['ph'])
+        if card["sig"] == sig: return
+        card["id"], card["sig"] = item["id"], sig
+        bg = COLORS["beige_dark"] if item.get("pinned") else COLORS["white"]
+        for k in ("frame", "row", "name", "del", "ren", "pin", "info"): card[k].configure(bg=bg)
         
-        if "id" not in record: record["id"] = str(uuid.uuid4())
-        if "pinned" not in record: record["pinned"] = False
+        sc = item['score']
+        col = COLORS["green_accent"] if sc>80 else (COLORS["beige_dark"] if sc>40 else COLORS["red_soft"])
+        card["score"].configure(text=f"{sc:.0f}", bg=col)
         
-        # Apply custom name if provided, else default
-        if custom_name:
-            record["name"] = custom_name
-        elif "name" not in record:
-            record["name"] = f"{record['source']} Formulation"
-            
-        history.append(record)
-        with open(full_path, 'w') as f: json.dump(history, f)
-        return record["id"]
-
-    def rename_item(self, item_id, new_name):
-        history = self.get_history()
-        for h in history:
-            if h.get("id") == item_id:
-                h["name"] = new_name
-                break
-        with open(os.path.join(self.base_path, self.history_file), 'w') as f: json.dump(history, f)
-
-    def get_history(self):
-        full_path = os.path.join(self.base_path, self.history_file)
-        if os.path.exists(full_path):
-            with open(full_path, 'r') as f: return json.load(f)
-        return []
-
-    def delete_item(self, item_id):
-        history = self.get_history()
-        history = [h for h in history if h.get("id") != item_id]
-        with open(os.path.join(self.base_path, self.history_file), 'w') as f: json.dump(history, f)
-
-    def toggle_pin(self, item_id):
-        history = self.get_history()
-        for h in history:
-            if h.get("id") == item_id: h["pinned"] = not h.get("pinned", False)
-        with open(os.path.join(self.base_path, self.history_file), 'w') as f: json.dump(history, f)
+        # Display NAME instead of Source
+        disp_name = item.get("name", item['source'])
+        if len(disp_name) > 15: disp_name = disp_name[:15] + "..."
+        card["name"].configure(text=f" {disp_name}")
+        card["info"].configure(text=f"{item['conc']}% Prot | pH {item['ph']}")
 
-# ==========================================
-# 3. AI ENGINE
-# ==========================================
-class AIModel:
-    def __init__(self):
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.scaler = StandardScaler()
-        self.is_trained = False
-        self.feature_columns = None
-
-    def train(self, ingredient_db):
-        data = []
-        sources = list(ingredient_db.keys())
-        for _ in range(2000):
-            src = np.random.choice(sources)
-            props = ingredient_db[src]
-            conc = np.random.uniform(2, 15)
-            fat = np.random.uniform(0.5, 6)
-            ph = np.random.uniform(3.8, 6.5)
-            stab = np.random.uniform(0.0, 1.2)
-            whc = props['whc'] + np.random.normal(0, 0.2)
-            sol = props['solubility'] + np.random.normal(0, 5)
-            
-            # Calibrated Logic
-            score = (conc * 3.5) + (fat * 2.0) + (stab * 30) + (whc * 5.0)
-            if ph < 4.4 and sol < 50: score -= 20
-            elif ph < 4.4: score -= 10
-            if sol > 80: score += 5
-            score = max(0, min(100, score))
-            score += np.random.normal(0, 1)
-            
-            data.append({'conc': conc, 'fat': fat, 'ph': ph, 'stab': stab, 'whc': whc, 'sol': sol, 'score': max(0, min(100, score)), 'source': src})
-            
-        df = pd.DataFrame(data)
-        df_encoded = pd.get_dummies(df, columns=['source'])
-        X = df_encoded.drop('score', axis=1)
-        y = df['score']
-        self.feature_columns = X.columns
-        X_scaled = self.scaler.fit_transform(X)
-        self.model.fit(X_scaled, y)
-        self.is_trained = True
-
-    def predict(self, inputs, source_name):
-        if not self.is_trained: return 0
-        input_data = pd.DataFrame([inputs])
-        for col in self.feature_columns:
-            if col.startswith('source_'):
-                input_data[col] = 1 if col == f"source_{source_name}" else 0
-            elif col not in input_data.columns:
-                input_data[col] = 0
-        input_data = input_data[self.feature_columns]
-        X_scaled = self.scaler.transform(input_data)
-        return self.model.predict(X_scaled)[0]
+    def _on_resize(self, event):
+        self.width = event.width
+        for card in self.pool: self.canvas.itemconfigure(card["win"], width=self.width - 20)
+        self.render()
 
-# ==========================================
-# 4. APP UI
-# ==========================================
 class PlantBotUI:
     def __init__(self, root):
         self.root = root
@@ -196,12 +373,22 @@ class PlantBotUI:
         
         self.storage = StorageManager()
         self.ai = AIModel()
+        self.model_cache = ModelCache()
         self.visualizer = VisualizationManager()
+        self.worker = BackgroundWorker(self.root, on_error=self.report_error)
         
         self.state = "IDLE"
         self.current_recipe = {}
         self.current_new_ing = ""
         self.temp_whc = 0.0
+        self.train_gen = 0
+        self.train_job = None  # future of the latest training run
+        self.latest_ai = None  # newest model built by the training worker (only touched on that thread)
+        self.pending_finalize = False
+        self.opt_results = []
+        self.compare = None  # list of recalled items while Compare mode is on
+        self.focus = None  # last recalled or finalized record; the default for 'Find similar'
+        self.lab_files = None  # measured lab exports the model is trained on ('Train lab'); None = synthetic
 
         self.setup_styles()
         self.build_layout()
@@ -227,15 +414,12 @@ class PlantBotUI:
         
         self.hist_canvas = tk.Canvas(sidebar, bg=COLORS["beige_light"], highlightthickness=0)
         sb = ttk.Scrollbar(sidebar, orient="vertical", command=self.hist_canvas.yview)
-        self.hist_frame = tk.Frame(self.hist_canvas, bg=COLORS["beige_light"])
-        
-        self.hist_frame.bind("<Configure>", lambda e: self.hist_canvas.configure(scrollregion=self.hist_canvas.bbox("all")))
-        win = self.hist_canvas.create_window((0,0), window=self.hist_frame, anchor="nw", width=320)
-        self.hist_canvas.bind("<Configure>", lambda e: self.hist_canvas.itemconfig(win, width=e.width))
+        self.sidebar = HistorySidebar(self.hist_canvas, on_open=self.recall, on_pin=self.pin_h, on_rename=self.rename_h, on_delete=self.del_h)
         
         self.hist_canvas.pack(side="left", fill="both", expand=True)
         sb.pack(side="right", fill="y")
-        self.hist_canvas.configure(yscrollcommand=sb.set)
+        # Re-render the visible window whenever the view scrolls
+        self.hist_canvas.configure(yscrollcommand=lambda lo, hi: (sb.set(lo, hi), self.sidebar.render()))
 
         # RIGHT CONTENT
         right = tk.Frame(main, bg=COLORS["white"])
@@ -259,17 +443,7 @@ class PlantBotUI:
         self.chat_frame = tk.Frame(split, bg=COLORS["white"])
         self.chat_frame.pack(side='left', fill='both', expand=True)
         
-        self.chat_cv = tk.Canvas(self.chat_frame, bg=COLORS["white"], highlightthickness=0)
-        csb = ttk.Scrollbar(self.chat_frame, command=self.chat_cv.yview)
-        self.chat_c_frame = tk.Frame(self.chat_cv, bg=COLORS["white"])
-        
-        self.chat_c_frame.bind("<Configure>", lambda e: self.chat_cv.configure(scrollregion=self.chat_cv.bbox("all")))
-        cwin = self.chat_cv.create_window((0,0), window=self.chat_c_frame, anchor="nw", width=550)
-        self.chat_cv.bind("<Configure>", lambda e: self.chat_cv.itemconfig(cwin, width=e.width))
-        
-        self.chat_cv.pack(side="left", fill="both", expand=True)
-        csb.pack(side="right", fill="y")
-        self.chat_cv.configure(yscrollcommand=csb.set)
+        self.transcript = ChatTranscript(self.chat_frame)
 
         # Chart
         chart_zone = tk.Frame(split, bg=COLORS["off_white"], width=300, bd=1, relief="solid")
@@ -286,6 +460,10 @@ class PlantBotUI:
         self.entry.bind("<Return>", self.send_message)
         tk.Button(inp_f, text="SUBMIT", bg=COLORS["dark_brown"], fg="white", font=("Helvetica", 10, "bold"), command=self.send_message, relief="flat", padx=20).pack(side='right', padx=15, pady=15)
 
+        # Model status
+        self.status_lbl = tk.Label(right, text="", bg=COLORS["white"], fg="#555", font=("Arial", 8), anchor='w')
+        self.status_lbl.pack(fill='x', padx=20, before=inp_f)
+
     def open_guide(self):
         messagebox.showinfo("Legend", "80-100: Premium/Thick\n40-79: Standard/Pourable\n0-39: Defect/Watery")
 
@@ -296,78 +474,76 @@ class PlantBotUI:
             self.refresh_sidebar()
 
     def refresh_sidebar(self):
-        for w in self.hist_frame.winfo_children(): w.destroy()
-        hist = self.storage.get_history()
-        hist.sort(key=lambda x: (not x.get("pinned", False), x.get("timestamp", "")), reverse=True)
-        for h in hist: self.create_card(h)
+        # Reading (or first importing) the history runs on the I/O thread; the window stays responsive
+        self.worker.run_io(self.storage.get_history, on_done=self.load_sidebar, on_error=self.report_error)
 
-    def create_card(self, item):
-        bg = COLORS["beige_dark"] if item.get("pinned") else COLORS["white"]
-        c = tk.Frame(self.hist_frame, bg=bg, pady=8, padx=8)
-        c.pack(fill='x', padx=10, pady=5)
-        
-        r1 = tk.Frame(c, bg=bg)
-        r1.pack(fill='x')
-        
-        sc = item['score']
-        col = COLORS["green_accent"] if sc>80 else (COLORS["beige_dark"] if sc>40 else COLORS["red_soft"])
-        tk.Label(r1, text=f"{sc:.0f}", bg=col, width=3, font=("Arial",9,"bold")).pack(side='left')
-        
-        # Display NAME instead of Source
-        disp_name = item.get("name", item['source'])
-        if len(disp_name) > 15: disp_name = disp_name[:15] + "..."
-        tk.Label(r1, text=f" {disp_name}", bg=bg, font=("Arial",10,"bold")).pack(side='left')
-        
-        # Actions: Rename, Delete, Pin
-        tk.Button(r1, text="🗑️", bg=bg, bd=0, command=lambda: self.del_h(item['id'])).pack(side='right')
-        tk.Button(r1, text="✏️", bg=bg, bd=0, command=lambda: self.rename_h(item['id'])).pack(side='right')
-        tk.Button(r1, text="📌", bg=bg, bd=0, command=lambda: self.pin_h(item['id'])).pack(side='right')
-        
-        tk.Label(c, text=f"{item['conc']}% Prot | pH {item['ph']}", bg=bg, fg="#555", font=("Arial", 8)).pack(anchor='w')
-        c.bind("<Button-1>", lambda e: self.recall(item))
+    @PERF.timed("ui.refresh_sidebar")
+    def load_sidebar(self, records):
+        self.sidebar.load(records)
+
+    def patch_sidebar(self, iid):
+        # Single-record update after a write: move/repaint one card instead of reloading the list
+        item = self.storage.get_item(iid)
+        if item is None: self.sidebar.remove(iid)
+        else: self.sidebar.upsert(item)
 
     def del_h(self, iid):
         if messagebox.askyesno("Delete", "Delete this record?"):
-            self.storage.delete_item(iid)
-            self.refresh_sidebar()
+            self.worker.run_io(self.storage.delete_item, iid, on_done=lambda _: self.sidebar.remove(iid), on_error=self.report_error)
             
     def rename_h(self, iid):
         new_name = simpledialog.askstring("Rename", "Enter new recipe name:", parent=self.root)
         if new_name:
-            self.storage.rename_item(iid, new_name)
-            self.refresh_sidebar()
+            self.worker.run_io(self.storage.rename_item, iid, new_name, on_done=lambda _: self.patch_sidebar(iid), on_error=self.report_error)
 
     def pin_h(self, iid):
-        self.storage.toggle_pin(iid)
-        self.refresh_sidebar()
+        self.worker.run_io(self.storage.toggle_pin, iid, on_done=lambda _: self.patch_sidebar(iid), on_error=self.report_error)
         
     def recall(self, item):
+        self.focus = item
+        if self.compare is None:
+            props = self.storage.load_ingredients().get(item['source'])
+            detail = ""
+            if props and self.ai.is_trained:
+                # Cached per formulation: recalling the same experiment again costs a dict lookup
+                inputs = {k: item[k] for k in INPUT_RANGES}
+                report = self.ai.explain({**inputs, 'whc': props['whc'], 'sol': props['solubility']}, item['source'])
+                detail = f"\n\n**Current model:** {self.interval_text(report)}\n\n{self.sensitivity_text(report, inputs)}"
+            self.add_message("Bot", f"📂 **File Retrieved:** {item.get('name', item['source'])}\nRe-loading sensory data...{detail}")
+            self.update_chart(item['score'], item['stab'], item['conc'])
+            return
         self.add_message("Bot", f"📂 **File Retrieved:** {item.get('name', item['source'])}\nRe-loading sensory data...")
-        self.update_chart(item['score'], item['stab'], item['conc'])
+        self.compare = [c for c in self.compare if c['id'] != item['id']][-(len(VisualizationManager.SERIES_COLORS) - 1):] + [item]
+        labelled = [(c.get('name', c['source'])[:18], {k: float(v) for k, v in radar_profile(c['score'], c['stab'], c['conc']).items()}) for c in self.compare]
+        self.visualizer.overlay_radar_chart(self.chart_cont, labelled)
+
+    @staticmethod
+    def interval_text(report):
+        if report["trees"] < 2: return f"{report['score']:.2f} / 100"
+        return f"{report['score']:.2f} / 100 ({report['coverage']}% of trees: {report['low']:.1f} - {report['high']:.1f})"
+
+    @staticmethod
+    def sensitivity_text(report, inputs):
+        # One sparkline per input on a shared score scale, strongest lever first
+        labels = {"conc": "Protein %", "fat": "Fat %", "ph": "pH", "stab": "Stabilizer %"}
+        bars = "▁▂▃▄▅▆▇█"
+        curves = report["curves"]
+        lo = min(min(c["mean"]) for c in curves.values())
+        hi = max(max(c["mean"]) for c in curves.values())
+        lines = []
+        for k, c in sorted(curves.items(), key=lambda kv: -(max(kv[1]["mean"]) - min(kv[1]["mean"]))):
+            spark = "".join(bars[int((v - lo) / max(hi - lo, 1e-9) * (len(bars) - 1) + 0.5)] for v in c["mean"])
+            best = c["x"][int(np.argmax(c["mean"]))]
+            lines.append(f"• {labels[k]} ({c['x'][0]:g}-{c['x'][-1]:g}, now {inputs[k]:g}): {spark}  swing {max(c['mean']) - min(c['mean']):.1f} | peak at {best:.2f}")
+        return "📈 **Sensitivity** (each input swept, others held fixed):\n" + "\n".join(lines)
 
     def update_chart(self, score, stab, conc):
-        data = {
-            "Texture": score,
-            "Stability": min(100, score * 1.1 if stab > 0.4 else score * 0.7),
-            "Cost": max(0, 100 - (conc * 5)),
-            "Nutrition": min(100, conc * 8)
-        }
+        data = {k: float(v) for k, v in radar_profile(score, stab, conc).items()}
         self.visualizer.create_radar_chart(self.chart_cont, data)
 
+    @PERF.timed("ui.add_message")
     def add_message(self, sender, text):
-        f = tk.Frame(self.chat_c_frame, bg=COLORS["white"], pady=5)
-        f.pack(fill='x', padx=5)
-        
-        bg = COLORS["green_accent"] if sender == "Bot" else COLORS["peach"]
-        align = "w" if sender == "Bot" else "e"
-        av = "🤖" if sender == "Bot" else "👤"
-        
-        lbl = tk.Label(f, text=text, bg=bg, fg=COLORS["dark_brown"], font=("Helvetica", 10), wraplength=450, justify="left", padx=15, pady=10)
-        tk.Label(f, text=av, bg=COLORS["white"], font=("Arial", 16)).pack(side=('left' if sender=="Bot" else 'right'), anchor='n', padx=5)
-        lbl.pack(side=('left' if sender=="Bot" else 'right'), anchor=align)
-        
-        self.root.update_idletasks()
-        self.chat_cv.yview_moveto(1.0)
+        self.transcript.append(sender, text)
 
     def send_message(self, event=None):
         msg = self.entry.get().strip()
@@ -380,8 +556,24 @@ class PlantBotUI:
     def process_logic(self, text):
         txt = text.lower()
         
+        if txt.strip() == "perf":
+            # Hidden diagnostics: hot-path timings plus storage cache hit rates
+            if not PERF.enabled:
+                self.add_message("Bot", "Instrumentation is disabled (PLANTBOT_STATS=0).")
+                return
+            cache = self.storage.cache_stats()
+            hits = " | ".join(f"{k}: {v['hits']} hits / {v['misses']} misses" for k, v in cache.items())
+            self.add_message("Bot", f"⏱️ **Performance Stats**\n\n{PERF.summary()}\n\nCache: {hits}")
+            return
+
         if self.state == "IDLE":
-            if "new" in txt:
+            if txt.startswith("optimize"):
+                self.start_optimize(text)
+            elif txt.startswith("find"):
+                self.find_history(text)
+            elif txt.split()[:1] == ["stats"]:
+                self.show_history_stats(text)
+            elif "new" in txt:
                 self.state = "ASK_PROTEIN"
                 ing = self.storage.load_ingredients()
                 s = "\n".join([f"• {k}: {v.get('desc','')}" for k,v in ing.items()])
@@ -390,6 +582,23 @@ class PlantBotUI:
                 self.current_new_ing = text[4:].strip().capitalize()
                 self.state = "DEFINE_WHC"
                 self.add_message("Bot", f"📝 **Material Characterization**\n\nWe are adding **{self.current_new_ing}** to the database.\n\nI need the **Water Holding Capacity (WHC)**.\n*Scientific Context:* This measures how many grams of water 1g of protein can bind. High WHC (>3.0) prevents syneresis (whey separation) but can create excessive viscosity.")
+            elif txt.strip() == "compare":
+                self.compare = [] if self.compare is None else None
+                if self.compare is None: self.add_message("Bot", "📊 Compare mode off. The chart shows one experiment at a time again.")
+                else: self.add_message("Bot", f"📊 **Compare Mode.**\n\nClick up to {len(VisualizationManager.SERIES_COLORS)} experiments in the Lab Notebook to overlay their profiles. Type 'Compare' again to exit.")
+            elif txt.strip() == "train lab":
+                files = filedialog.askopenfilenames(title="Lab measurements", filetypes=[("Lab exports", "*.csv *.jsonl *.ndjson"), ("All files", "*.*")])
+                if not files: return
+                self.lab_files = list(files)
+                self.start_training()
+                self.add_message("Bot", f"🧫 **Training on Measured Data.**\n\nStreaming {len(files)} lab file(s) in chunks with a bounded sample, so memory stays capped however large the exports are. The current model keeps answering until the new one is ready.\nType 'Train synthetic' to go back to the simulated dataset.")
+            elif txt.strip() == "train synthetic":
+                self.lab_files = None
+                self.start_training()
+                self.add_message("Bot", "🔄 Switching back to the synthetic training set in the background.")
+            elif txt.strip() == "retrain":
+                self.start_training(full=True)
+                self.add_message("Bot", "🔄 **Full Rebuild Started.**\n\nRegenerating the synthetic dataset for every substrate and refitting the whole forest in the background.")
             else: self.add_message("Bot", "Please type **'New'** to initiate a valid experimental protocol.")
 
         elif self.state == "ASK_PROTEIN":
@@ -414,12 +623,23 @@ class PlantBotUI:
 
         elif self.state == "DEFINE_SOL":
             try:
-                self.storage.save_ingredient(self.current_new_ing, {"whc": self.temp_whc, "solubility": float(text), "desc": "User customized."})
-                self.ai.train(self.storage.load_ingredients())
+                entry = {"whc": self.temp_whc, "solubility": float(text), "desc": "User customized."}
+                self.worker.run_io(self.storage.save_ingredient, self.current_new_ing, entry, on_done=lambda _, name=self.current_new_ing: self.start_training(new_source=name), on_error=self.report_error)
                 self.state = "IDLE"
-                self.add_message("Bot", f"✅ **Database Synchronized**\n\n{self.current_new_ing} has been successfully characterized and integrated into the prediction model.\nType 'New' to test it.")
+                self.add_message("Bot", f"✅ **Database Synchronized**\n\n{self.current_new_ing} has been characterized. The prediction model is updating in the background; until it finishes, analyses use the previous model.\nType 'New' to test it.")
             except: self.add_message("Bot", "Input Error: Numeric value required.")
 
+        elif self.state == "OPT_PICK":
+            picks = list(self.opt_results) if txt.strip() == "all" else []
+            for tok in txt.replace(",", " ").split():
+                if tok.isdigit() and 1 <= int(tok) <= len(self.opt_results) and self.opt_results[int(tok) - 1] not in picks:
+                    picks.append(self.opt_results[int(tok) - 1])
+            for r in picks:
+                record = {"timestamp": str(datetime.datetime.now()), **{k: r[k] for k in ("source", "conc", "fat", "ph", "stab", "score")}}
+                self.worker.run_io(self.storage.save_history_item, record, f"{r['source']} Optimized #{self.opt_results.index(r) + 1}", on_done=self.patch_sidebar, on_error=self.report_error)
+            self.state = "IDLE"
+            self.add_message("Bot", f"💾 Archived {len(picks)} optimized recipe(s) to the Lab Notebook." if picks else "Nothing archived. Type 'New' or 'Optimize [Source]' to continue.")
+
         elif self.state == "ASK_CONC":
             try:
                 self.current_recipe['conc'] = float(text)
@@ -447,16 +667,134 @@ class PlantBotUI:
                 self.finalize()
             except: self.add_message("Bot", "Input Error: Numeric value required.")
 
+    def start_optimize(self, text):
+        # Optimize <source> [conc|fat|ph|stab|texture|stability|cost|nutrition lo-hi] ... [grid N]
+        tokens = text.split()
+        db = self.storage.load_ingredients()
+        source = tokens[1].capitalize() if len(tokens) > 1 else ""
+        if source not in db:
+            self.add_message("Bot", "⚠️ Usage: **Optimize [Source] [ph 4.3-4.6] [cost 40-100] ...**\nThe source must be in the substrate database.")
+            return
+        bounds, chart_bounds, grid = {}, {}, None
+        try:
+            for name, rng in zip(tokens[2::2], tokens[3::2]):
+                if name.lower() == "grid":
+                    # Points per input: the search scores grid**4 candidates
+                    lo_n, hi_n = FormulationOptimizer.GRID_LIMITS
+                    grid = min(hi_n, max(lo_n, int(rng)))
+                    continue
+                lo, hi = (float(v) for v in rng.split("-"))
+                if name.lower() in INPUT_RANGES: bounds[name.lower()] = (lo, hi)
+                elif name.capitalize() in ("Texture", "Stability", "Cost", "Nutrition"): chart_bounds[name.capitalize()] = (lo, hi)
+                else: raise ValueError(name)
+        except ValueError:
+            self.add_message("Bot", "⚠️ Constraint Error: use pairs like **ph 4.3-4.6**, **cost 40-100** or **grid 24**.")
+            return
+        if not self.ai.is_trained:
+            self.add_message("Bot", "⏳ The prediction model is still loading. Please retry in a moment.")
+            return
+        self.set_status(f"⏳ Optimizing {source}...")
+        ai = self.ai
+        options = {"grid": grid} if grid else {}
+        def job():
+            # The grid search scores ~1M rows, where sklearn's forests beat the compiled arrays
+            return FormulationOptimizer(self.model_cache.with_estimators(ai)).optimize(source, db[source], bounds, chart_bounds, **options)
+        self.worker.run_compute(job, on_done=self.show_optimize, on_error=self.report_error)
+
+    def parse_history_query(self, tokens):
+        # [source ...] [all] [score|conc|fat|ph|stab lo-hi] ... -> (sources, ranges)
+        db = self.storage.load_ingredients()
+        sources, ranges = [], {}
+        it = iter(tokens)
+        for tok in it:
+            if tok.lower() == "all": continue
+            if tok.capitalize() in db: sources.append(tok.capitalize())
+            elif tok.lower() in HistoryIndex.COLUMNS:
+                lo, hi = (float(v) for v in next(it, "").split("-"))
+                ranges[tok.lower()] = (lo, hi)
+            else: raise ValueError(tok)
+        return sources or None, ranges
+
+    @staticmethod
+    def _recipe_line(rec):
+        return f"{rec.get('name', rec['source'])} | {rec['source']} | {float(rec['score']):.1f} | {rec['conc']}% Prot | {rec['fat']}% Fat | pH {rec['ph']} | {rec['stab']}% Stab"
+
+    def find_history(self, text):
+        # Find [source] [score 60-90] [ph 4.3-4.6] ...  |  Find similar [recipe name]
+        tokens = text.split()[1:]
+        target = None
+        if tokens and tokens[0].lower() == "similar":
+            name = " ".join(tokens[1:])
+            target = self.storage.find_by_name(name) if name else self.focus
+            if target is None:
+                self.add_message("Bot", f"⚠️ No experiment named **{name}** in the Lab Notebook." if name else "⚠️ Recall an experiment first, or type **Find similar [Recipe Name]**.")
+                return
+            tokens = []
+        try: sources, ranges = self.parse_history_query(tokens)
+        except ValueError:
+            self.add_message("Bot", "⚠️ Usage: **Find [Source] [score 60-90] [ph 4.3-4.6] ...** or **Find similar [Recipe Name]**.")
+            return
+        res = self.storage.find_history(sources, similar_to=target, **ranges)
+        summary = res["summary"]
+        if not summary["count"]:
+            self.add_message("Bot", "🔎 No archived experiment matches those filters.")
+            return
+        if target is not None:
+            rows = "\n".join(f"{i}. {self._recipe_line(rec)} (distance {dist:.2f})" for i, (rec, dist) in enumerate(res["matches"], 1))
+            self.add_message("Bot", f"🧬 **Recipes similar to {target.get('name', target['source'])}**\n\n{rows or 'No other experiments on record.'}")
+            return
+        means = " | ".join(f"{c} {summary[c]['mean']:.2f} ({summary[c]['min']:.2f}-{summary[c]['max']:.2f})" for c in HistoryIndex.COLUMNS)
+        rows = "\n".join(f"{i}. {self._recipe_line(rec)}" for i, (rec, _) in enumerate(res["matches"], 1))
+        self.add_message("Bot", f"🔎 **{summary['count']} matching experiments**\n\nMean (range): {means}\n\n**Best scores:**\n{rows}")
+
+    def show_history_stats(self, text):
+        # Stats [all|source ...] [score|conc|fat|ph|stab lo-hi] ...; bare 'Stats' covers all sources
+        try: sources, ranges = self.parse_history_query(text.split()[1:])
+        except ValueError:
+            self.add_message("Bot", "⚠️ Usage: **Stats all** or **Stats [Source] [ph 4.3-4.6] ...**")
+            return
+        res = self.storage.history_stats(sources, **ranges)
+        if not res["summary"]["count"]:
+            self.add_message("Bot", "📈 No archived experiment matches those filters.")
+            return
+        rows = "\n".join(f"• {src}: {d['count']} runs | mean {d['mean']:.1f} | quartiles {d['p25']:.1f} / {d['p50']:.1f} / {d['p75']:.1f} | best {d['max']:.1f}\n"
+                         f"   ≤40: {d['bands'][0]} · 40-60: {d['bands'][1]} · 60-80: {d['bands'][2]} · >80: {d['bands'][3]}"
+                         for src, d in sorted(res["by_source"].items(), key=lambda kv: -kv[1]["p50"]))
+        self.add_message("Bot", f"📈 **Score Distribution by Source** ({res['summary']['count']} experiments)\n\n{rows}")
+
+    def show_optimize(self, results):
+        self.set_status("")
+        if not results:
+            self.add_message("Bot", "❌ **No feasible formulation** satisfies those constraints.")
+            return
+        rows = "\n".join([f"{i}. {r['score']:.1f} | {r['conc']}% Prot | {r['fat']}% Fat | pH {r['ph']} | {r['stab']}% Stab" for i, r in enumerate(results, 1)])
+        best = results[0]
+        if self.state != "IDLE":
+            # The user started another protocol while the search ran: report only, don't hijack the next answer
+            self.add_message("Bot", f"🧭 **Optimization Complete: {best['source']}**\n\n{rows}\n\nRun 'Optimize' again from an idle session to archive any of these.")
+            return
+        self.opt_results = results
+        self.state = "OPT_PICK"
+        self.update_chart(best['score'], best['stab'], best['conc'])
+        self.add_message("Bot", f"🧭 **Optimization Complete: {best['source']}**\n\n{rows}\n\nType the numbers to archive (e.g. '1 3'), 'all', or anything else to skip.")
+
     def finalize(self):
+        if not self.ai.is_trained:
+            # First model still warming up; finalize runs as soon as it is swapped in
+            self.pending_finalize = True
+            if self.train_job is None or self.train_job.done(): self.start_training()  # the last run failed
+            self.add_message("Bot", "⏳ The prediction model is still loading. Your analysis will appear as soon as it is ready.")
+            return
         r = self.current_recipe
         inputs = {'conc': r['conc'], 'fat': r['fat'], 'ph': r['ph'], 'stab': r['stab'], 'whc': r['props']['whc'], 'sol': r['props']['solubility']}
-        score = self.ai.predict(inputs, r['source'])
+        analysis = self.ai.explain(inputs, r['source'])
+        score = analysis['score']
         
         self.update_chart(score, r['stab'], r['conc'])
         
         # GENERATE DETAILED REPORT
         report = f"📊 **Final Rheological Analysis**\n\n"
-        report += f"**Predicted Texture Score:** {score:.2f} / 100\n\n"
+        report += f"**Predicted Texture Score:** {self.interval_text(analysis)}\n\n"
         
         if score > 80:
             report += "🏆 **Outcome: Premium Structure.**\nThe model predicts a highly stable, cohesive gel network. The protein concentration and pH are perfectly aligned to create a 'spoonable' texture similar to Greek Dairy Yogurt. Syneresis risk is minimal."
@@ -471,16 +809,79 @@ class PlantBotUI:
         recipe_name = simpledialog.askstring("Save Recipe", "🧪 Formulation Complete.\n\nEnter a name for this recipe (e.g. 'Greek Style v1'):", parent=self.root)
         if not recipe_name: recipe_name = f"{r['source']} Formulation"
 
-        self.storage.save_history_item({"timestamp": str(datetime.datetime.now()), "source": r['source'], "conc": r['conc'], "fat": r['fat'], "ph": r['ph'], "stab": r['stab'], "score": float(score)}, custom_name=recipe_name)
-        self.refresh_sidebar()
+        record = {"timestamp": str(datetime.datetime.now()), "source": r['source'], "conc": r['conc'], "fat": r['fat'], "ph": r['ph'], "stab": r['stab'], "score": float(score)}
+        self.worker.run_io(self.storage.save_history_item, record, recipe_name, on_done=self.patch_sidebar, on_error=self.report_error)
+        self.focus = record
         
+        report += "\n\n" + self.sensitivity_text(analysis, inputs)
         self.add_message("Bot", report + "\n\nData archived to Lab Notebook.")
         self.state = "IDLE"
 
     def initial_training(self):
-        self.ai.train(self.storage.load_ingredients())
+        self.start_training()
+
+    def start_training(self, new_source=None, full=False):
+        # Builds a new AIModel in the worker; self.ai keeps serving predictions until the swap.
+        # With new_source, only that substrate is fitted on top of the latest model.
+        self.train_gen += 1
+        gen = self.train_gen
+        lab_files = self.lab_files
+        def job():
+            db = self.storage.load_ingredients()
+            progress = lambda msg: self.worker.post(self.set_status, f"⏳ Model updating: {msg}")
+            base = self.latest_ai
+            if new_source and not full and base is not None and base.is_trained:
+                new_ai = base.clone()
+                self.model_cache.load_or_extend(new_ai, db, new_source, progress=progress)
+            else:
+                new_ai = AIModel()
+                if lab_files: new_ai.use_lab_data(lab_files)
+                self.model_cache.load_or_train(new_ai, db, progress=progress, force=full)
+            new_ai.release_estimators()  # cached above; the UI only needs the compiled arrays
+            self.latest_ai = new_ai
+            return new_ai
+        self.set_status("⏳ Model updating...")
+        self.train_job = self.worker.run_training(job, on_done=lambda ai: self.swap_model(ai, gen), on_error=self.training_failed)
+
+    def swap_model(self, new_ai, gen):
+        if gen != self.train_gen: return  # a newer training run supersedes this one
+        self.ai = new_ai
+        self.set_status("✅ Model ready.")
+        if self.pending_finalize:
+            self.pending_finalize = False
+            self.finalize()
+
+    def set_status(self, text):
+        self.status_lbl.config(text=text)
+
+    def training_failed(self, exc):
+        self.report_error(exc)
+        if self.pending_finalize:
+            # The deferred analysis would otherwise wait for a model that is never coming
+            self.pending_finalize = False
+            self.add_message("Bot", "The analysis could not run without a model. Re-enter the **Stabilizer Dosage (%)** to retry training and analysis.")
+
+    def report_error(self, exc):
+        self.set_status("")
+        self.add_message("Bot", f"⚠️ **Background task failed:** {exc}")
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="PlantBot AI formulation lab")
+    parser.add_argument("--profile", metavar="FILE", help="write a cProfile dump of the Tk thread for this session")
+    parser.add_argument("--no-stats", action="store_true", help="disable the timing hooks behind the 'perf' command")
+    args = parser.parse_args()
+    if args.no_stats: PERF.enabled = False
+
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
     root = tk.Tk()
     app = PlantBotUI(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.worker.shutdown()
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
\ No newline at end of file
@@ -0,0 +1,124 @@
+import argparse
+import os
+import sys
+import time
+import json
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from plantbot_core import StorageManager, AIModel, ModelCache, read_chunks
+
+# ==========================================
+# HEADLESS BATCH SCORING
+# ==========================================
+# Scores large CSV/JSONL formulation files without a display:
+#   python batch_score.py screening.csv -o scored.csv --storage /mnt/lab --workers 8
+# Input rows need source, conc, fat, ph, stab. Chunks are scored on a process pool with a
+# bounded number in flight and written out in input order, so memory stays flat on any size.
+INPUT_COLUMNS = ['source', 'conc', 'fat', 'ph', 'stab']
+
+_worker = {}
+
+def _init_worker(model, ingredient_db):
+    # Runs once per process. A compiled model file is memory-mapped, so all workers share its
+    # pages through the OS cache; models that cannot be compiled are unpickled per worker.
+    if isinstance(model, str): ai = AIModel.load_compiled(model)
+    else:
+        ai = AIModel()
+        ai.load_state(model)
+    _worker["ai"], _worker["db"] = ai, ingredient_db
+
+def score_chunk(chunk, ai=None, ingredient_db=None):
+    ai = ai or _worker["ai"]
+    db = ingredient_db or _worker["db"]
+    sources = chunk['source'].astype(str).str.strip().str.capitalize()
+    whc = sources.map({k: v['whc'] for k, v in db.items()}).to_numpy(dtype=float)
+    sol = sources.map({k: v['solubility'] for k, v in db.items()}).to_numpy(dtype=float)
+    X = np.column_stack([chunk[c].to_numpy(dtype=float) for c in INPUT_COLUMNS[1:]] + [whc, sol])
+    known = ~np.isnan(X).any(axis=1)  # unknown substrate or missing input: score left blank
+    scores = np.full(len(chunk), np.nan)
+    if known.any(): scores[known] = ai.predict_many(X[known], sources[known].tolist())
+    out = chunk.copy()
+    out['score'] = np.round(scores, 3)
+    return out
+
+class ChunkWriter:
+    def __init__(self, path):
+        self.jsonl = bool(path) and path.endswith((".jsonl", ".ndjson"))
+        self.f = open(path, 'w', newline='') if path else sys.stdout
+        self.header = True
+
+    def write(self, frame):
+        if self.jsonl:
+            text = frame.to_json(orient='records', lines=True)
+            self.f.write(text if not text or text.endswith("\n") else text + "\n")
+        else:
+            frame.to_csv(self.f, index=False, header=self.header)
+        self.header = False
+
+    def close(self):
+        if self.f is not sys.stdout: self.f.close()
+
+def load_model(storage_path, lab_files=None, memory_mb=256, estimator="forest"):
+    storage = StorageManager()
+    if storage_path: storage.set_mode("CLOUD", storage_path)
+    db = storage.load_ingredients()
+    ai = AIModel()
+    if lab_files: ai.use_lab_data(lab_files, memory_mb=memory_mb, estimator=estimator)
+    ModelCache().load_or_train(ai, db)
+    return ai, db
+
+def run(input_path, output_path=None, storage_path=None, workers=None, chunk_size=50_000, log=sys.stderr, lab_files=None, memory_mb=256, estimator="forest"):
+    ai, db = load_model(storage_path, lab_files, memory_mb, estimator)
+    workers = workers or os.cpu_count() or 1
+    writer = ChunkWriter(output_path)
+    compiled_path = None
+    if workers > 1 and ai.compiled:
+        fd, compiled_path = tempfile.mkstemp(suffix=".pbforest")
+        os.close(fd)
+        ai.export_compiled(compiled_path)
+    rows, start = 0, time.perf_counter()
+
+    def done(frame):
+        nonlocal rows
+        writer.write(frame)
+        rows += len(frame)
+        elapsed = time.perf_counter() - start
+        print(f"{rows} rows | {rows / max(elapsed, 1e-9):,.0f} rows/s", file=log)
+
+    try:
+        if workers == 1:
+            for chunk in read_chunks(input_path, chunk_size): done(score_chunk(chunk, ai, db))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(compiled_path or ai.export_state(), db)) as pool:
+                in_flight = deque()
+                for chunk in read_chunks(input_path, chunk_size):
+                    in_flight.append(pool.submit(score_chunk, chunk))
+                    if len(in_flight) >= 2 * workers: done(in_flight.popleft().result())
+                while in_flight: done(in_flight.popleft().result())
+    finally:
+        writer.close()
+        if compiled_path: os.remove(compiled_path)
+    elapsed = time.perf_counter() - start
+    summary = {"rows": rows, "seconds": round(elapsed, 3), "rows_per_second": round(rows / max(elapsed, 1e-9), 1), "workers": workers}
+    print(json.dumps(summary), file=log)
+    return summary
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Score a CSV/JSONL file of formulations (source, conc, fat, ph, stab) without the GUI.")
+    p.add_argument("input", help="CSV file, or .jsonl/.ndjson with one formulation per line")
+    p.add_argument("-o", "--output", help="output file (.csv or .jsonl); defaults to CSV on stdout")
+    p.add_argument("--storage", help="folder holding plantbot_ingredients.json (default: current dir); models are cached locally")
+    p.add_argument("--workers", type=int, default=None, help="scoring processes (default: all cores)")
+    p.add_argument("--chunk-size", type=int, default=50_000, help="rows per chunk")
+    p.add_argument("--lab-data", nargs="+", metavar="FILE", help="train on measured lab CSV/JSONL files (source, conc, fat, ph, stab, score) instead of synthetic data")
+    p.add_argument("--memory-mb", type=int, default=256, help="peak memory for lab training")
+    p.add_argument("--estimator", choices=["forest", "hist"], default="forest", help="lab model: random forest or histogram gradient boosting")
+    args = p.parse_args(argv)
+    run(args.input, args.output, args.storage, args.workers, args.chunk_size, lab_files=args.lab_data, memory_mb=args.memory_mb, estimator=args.estimator)
+
+if __name__ == "__main__":
+    main()
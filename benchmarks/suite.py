@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+from plantbot_core import StorageManager, AIModel, HistoryLog  # noqa: E402
+
+# ==========================================
+# BENCHMARK SUITE
+# ==========================================
+# Reproducible timings for training, prediction, history storage and the Tk refresh paths:
+#   python benchmarks/suite.py -o results.json                       # full run
+#   python benchmarks/suite.py --quick --baseline baseline.json      # compare, exit 1 on regression
+#   python benchmarks/suite.py --save-baseline baseline.json
+# Metrics are flat "group.name" keys. Keys ending in _per_s are throughputs (higher is better);
+# everything else (seconds, ms, bytes) is lower-is-better.
+
+def synthetic_db(n_sources, seed=0):
+    rng = np.random.default_rng(seed)
+    return {f"Src{i:03d}": {"whc": float(rng.uniform(1, 5)), "solubility": float(rng.uniform(15, 95))} for i in range(n_sources)}
+
+def timed(fn, *args, **kwargs):
+    t = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - t, result
+
+def bench_training(quick):
+    metrics = {}
+    AIModel().train(synthetic_db(2), n_samples=50, seed=0)  # warm-up: keep the sklearn import out of the timings
+    samples = [2000, 20000] if quick else [2000, 20000, 100000]
+    sources = [5, 50] if quick else [5, 50, 200]
+    for n in samples:
+        for k in sources:
+            ai = AIModel()
+            secs, _ = timed(ai.train, synthetic_db(k), n_samples=n, seed=0)
+            metrics[f"train.samples={n}.sources={k}.seconds"] = secs
+    ai = AIModel()
+    ai.train(synthetic_db(50), n_samples=2000, seed=0)
+    secs, _ = timed(ai.add_source, "NewSrc", {"whc": 3.0, "solubility": 70})
+    metrics["train.incremental_add_source.sources=50.seconds"] = secs
+    return metrics
+
+def bench_prediction(quick):
+    db = synthetic_db(5)
+    ai = AIModel()
+    ai.train(db, seed=0)
+    rng = np.random.default_rng(1)
+    inputs = {"conc": 8.0, "fat": 3.0, "ph": 4.5, "stab": 0.4, "whc": 3.0, "sol": 60.0}
+    lat = []
+    for _ in range(200 if quick else 1000):
+        t = time.perf_counter()
+        ai.predict(inputs, "Src000")
+        lat.append((time.perf_counter() - t) * 1e3)
+    metrics = {"predict.single.p50_ms": float(np.percentile(lat, 50)), "predict.single.p99_ms": float(np.percentile(lat, 99))}
+    for n in ([10_000] if quick else [10_000, 200_000]):
+        X = np.column_stack([rng.uniform(2, 15, n), rng.uniform(0.5, 6, n), rng.uniform(3.8, 6.5, n), rng.uniform(0, 1.2, n), rng.uniform(1, 5, n), rng.uniform(20, 90, n)])
+        src = list(rng.choice(sorted(db), n))
+        secs, _ = timed(ai.predict_many, X, src)
+        metrics[f"predict.batch.n={n}.rows_per_s"] = n / secs
+    return metrics
+
+def bench_storage(quick):
+    metrics = {}
+    sizes = [10, 1000, 10_000] if quick else [10, 100, 1000, 10_000, 100_000]
+    ops = 50 if quick else 200
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as d:
+            # Seed the log directly (one compacted put per record) rather than through N saves
+            seed = HistoryLog(os.path.join(d, "plantbot_history.jsonl"))
+            seed.index = {f"id{i}": {"id": f"id{i}", "timestamp": f"2026-01-01 00:00:{i:09d}", "source": "Pea", "conc": 8.0, "fat": 3.0,
+                                     "ph": 4.5, "stab": 0.4, "score": 70.0, "name": f"R{i}", "pinned": False} for i in range(size)}
+            seed.compact()
+            storage = StorageManager()
+            storage.set_mode("LOCAL", d)
+            secs, _ = timed(storage.get_history)
+            metrics[f"storage.n={size}.load_ms"] = secs * 1e3
+            ids = [f"id{i}" for i in np.random.default_rng(2).choice(size, min(ops, size), replace=False)]
+            for name, op in (("save", lambda i: storage.save_history_item({"timestamp": "t", "source": "Pea", "conc": 1, "fat": 1, "ph": 5, "stab": 0.1, "score": 50.0})),
+                             ("rename", lambda i: storage.rename_item(i, "Renamed")),
+                             ("pin", lambda i: storage.toggle_pin(i)),
+                             ("delete", lambda i: storage.delete_item(i))):
+                secs, _ = timed(lambda: [op(i) for i in ids])
+                metrics[f"storage.n={size}.{name}_ms"] = secs * 1e3 / len(ids)
+            secs, _ = timed(storage.get_history)
+            metrics[f"storage.n={size}.cached_read_ms"] = secs * 1e3
+    return metrics
+
+def _ensure_display():
+    # Use the real display if there is one; otherwise try a private Xvfb
+    if os.environ.get("DISPLAY"): return None
+    if not shutil.which("Xvfb"): return False
+    proc = subprocess.Popen(["Xvfb", ":97", "-screen", "0", "1280x1024x24"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = ":97"
+    time.sleep(1.0)
+    return proc
+
+def bench_ui(quick):
+    xvfb = _ensure_display()
+    if xvfb is False: return {}, "no display and no Xvfb available"
+    try:
+        import tkinter as tk
+        import app
+        metrics = {}
+        sizes = [100, 5000] if quick else [100, 5000, 50_000]
+        cwd = os.getcwd()
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as d:
+                os.chdir(d)
+                try:
+                    log = HistoryLog(os.path.join(d, "plantbot_history.jsonl"))
+                    log.index = {f"id{i}": {"id": f"id{i}", "timestamp": f"2026-01-01 {i:09d}", "source": "Pea", "conc": 8.0, "fat": 3.0,
+                                            "ph": 4.5, "stab": 0.4, "score": float(i % 100), "name": f"R{i}", "pinned": i % 50 == 0} for i in range(size)}
+                    log.compact()
+                    root = tk.Tk()
+                    ui = app.PlantBotUI(root)
+                    deadline = time.perf_counter() + 120
+                    while not ui.ai.is_trained and time.perf_counter() < deadline:  # keep background training out of the timings
+                        root.update()
+                        time.sleep(0.02)
+                    tracemalloc.start()
+                    def reload():
+                        # The history is read on the I/O thread; time until the sidebar holds it
+                        ui.sidebar.keys = []
+                        ui.refresh_sidebar()
+                        while len(ui.sidebar.keys) < size:
+                            root.update()
+                            time.sleep(0.001)
+                    secs, _ = timed(reload)
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    metrics[f"ui.refresh_sidebar.n={size}.ms"] = secs * 1e3
+                    metrics[f"ui.refresh_sidebar.n={size}.peak_bytes"] = peak
+                    ui.worker.shutdown()
+                    root.destroy()
+                finally:
+                    os.chdir(cwd)
+        root = tk.Tk()
+        frame = tk.Frame(root)
+        frame.pack()
+        viz = app.VisualizationManager()
+        data = lambda s: {"Texture": s, "Stability": s * 0.9, "Cost": 60.0, "Nutrition": 64.0}
+        viz.create_radar_chart(frame, data(50.0))
+        root.update()
+        reps = 20 if quick else 100
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        lat = []
+        for i in range(reps):
+            t = time.perf_counter()
+            viz.create_radar_chart(frame, data(float(i % 100)))
+            root.update()
+            lat.append((time.perf_counter() - t) * 1e3)
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        metrics["ui.radar_chart.p50_ms"] = float(np.percentile(lat, 50))
+        metrics["ui.radar_chart.growth_bytes"] = max(0, after - before)
+        root.destroy()
+        return metrics, None
+    except Exception as e:
+        return {}, f"{type(e).__name__}: {e}"
+    finally:
+        if xvfb: xvfb.terminate()
+
+def compare(current, baseline, tolerance):
+    regressions = []
+    for key, base in baseline.items():
+        if key not in current or not base: continue
+        ratio = current[key] / base
+        worse = ratio < 1 - tolerance if key.endswith("_per_s") else ratio > 1 + tolerance
+        if worse: regressions.append({"metric": key, "baseline": base, "current": current[key], "ratio": round(ratio, 3)})
+    return regressions
+
+def run(quick=False, groups=("training", "prediction", "storage", "ui")):
+    metrics, skipped = {}, {}
+    benches = {"training": bench_training, "prediction": bench_prediction, "storage": bench_storage}
+    for g in groups:
+        if g == "ui":
+            m, why = bench_ui(quick)
+            if why: skipped["ui"] = why
+        else:
+            m = benches[g](quick)
+        metrics.update(m)
+    return {"meta": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(), "quick": quick,
+                     "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "metrics": {k: round(float(v), 6) for k, v in metrics.items()}, "skipped": skipped}
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="PlantBot performance benchmark suite.")
+    p.add_argument("-o", "--output", help="write results JSON here (default: stdout)")
+    p.add_argument("--quick", action="store_true", help="smaller sizes for CI-style runs")
+    p.add_argument("--only", nargs="+", choices=["training", "prediction", "storage", "ui"], help="run a subset of groups")
+    p.add_argument("--baseline", help="results JSON to compare against")
+    p.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before a metric counts as a regression")
+    p.add_argument("--save-baseline", help="also write the results to this baseline file")
+    args = p.parse_args(argv)
+
+    results = run(args.quick, tuple(args.only or ("training", "prediction", "storage", "ui")))
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)["metrics"]
+        results["regressions"] = compare(results["metrics"], baseline, args.tolerance)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f: f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f: f.write(text + "\n")
+    sys.exit(1 if results.get("regressions") else 0)
+
+if __name__ == "__main__":
+    main()
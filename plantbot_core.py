@@ -0,0 +1,1224 @@
+import numpy as np
+import os
+import json
+import uuid
+import hashlib
+import pickle
+import copy
+import threading
+import time
+import functools
+import warnings
+from collections import OrderedDict
+from importlib import metadata
+
+# GUI-free core: storage, model and scoring. Nothing here imports Tk or matplotlib, and
+# scikit-learn is only imported when a model is first trained or loaded, so both the GUI and
+# headless tools (batch_score.py) start quickly.
+
+def _sklearn_version():
+    try: return metadata.version("scikit-learn")
+    except metadata.PackageNotFoundError: return "unknown"
+
+# ==========================================
+# 1. INSTRUMENTATION
+# ==========================================
+class PerfStats:
+    # Hot-path counters per label: calls, total/max time and bytes read/written.
+    # Disabled (PLANTBOT_STATS=0, or enabled = False) a hook costs one attribute check.
+    def __init__(self):
+        self.enabled = os.environ.get("PLANTBOT_STATS", "1") != "0"
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def _entry(self, name):
+        e = self.entries.get(name)
+        if e is None: e = self.entries[name] = {"calls": 0, "total": 0.0, "max": 0.0, "read": 0, "written": 0}
+        return e
+
+    def record(self, name, seconds):
+        with self.lock:
+            e = self._entry(name)
+            e["calls"] += 1
+            e["total"] += seconds
+            if seconds > e["max"]: e["max"] = seconds
+
+    def add_bytes(self, name, read=0, written=0):
+        if not self.enabled: return
+        with self.lock:
+            e = self._entry(name)
+            e["read"] += read
+            e["written"] += written
+
+    def timed(self, name):
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                if not self.enabled: return fn(*args, **kwargs)
+                t = time.perf_counter()
+                try: return fn(*args, **kwargs)
+                finally: self.record(name, time.perf_counter() - t)
+            return inner
+        return wrap
+
+    def reset(self):
+        with self.lock: self.entries = {}
+
+    def summary(self):
+        with self.lock: rows = sorted(self.entries.items(), key=lambda kv: kv[1]["total"], reverse=True)
+        lines = []
+        for name, e in rows:
+            parts = [f"{e['calls']} calls | {e['total'] * 1e3:.1f} ms total | {e['max'] * 1e3:.1f} ms max"] if e["calls"] else []
+            if e["read"] or e["written"]: parts.append(f"{e['read'] / 1024:.1f} KB read / {e['written'] / 1024:.1f} KB written")
+            lines.append(f"• {name}: " + " | ".join(parts))
+        return "\n".join(lines) or "No hooks recorded yet."
+
+PERF = PerfStats()
+
+# ==========================================
+# 2. STORAGE MANAGER
+# ==========================================
+class StorageManager:
+    def __init__(self):
+        self.mode = "LOCAL"
+        self.base_path = os.getcwd()
+        self.history_file = "plantbot_history_named.json"  # legacy whole-file format, imported on first use
+        self.history_log = "plantbot_history.jsonl"
+        self.ingredients_file = "plantbot_ingredients.json"
+        self.history = None
+        # Read-through ingredient cache, revalidated against the file's (mtime, size) on every read
+        self.ing_cache = None
+        self.ing_stamp = None
+        self.ing_hits = 0
+        self.ing_misses = 0
+        
+    def set_mode(self, mode, path=None):
+        self.mode = mode
+        if path: self.base_path = path
+        if not os.path.exists(self.base_path):
+            try: os.makedirs(self.base_path)
+            except: pass
+
+    @PERF.timed("storage.load_ingredients")
+    def load_ingredients(self):
+        full_path = os.path.join(self.base_path, self.ingredients_file)
+        if not os.path.exists(full_path):
+            defaults = {
+                "Pea": {"whc": 3.0, "solubility": 60, "desc": "Globulin-heavy. Earthy notes. Good gelling."},
+                "Soy": {"whc": 4.5, "solubility": 85, "desc": "The gold standard. High solubility, neutral taste."},
+                "Oat": {"whc": 2.5, "solubility": 40, "desc": "High starch/beta-glucan. Viscous but weak gel."},
+                "Fava": {"whc": 3.5, "solubility": 55, "desc": "High foaming capacity. Can be beany."},
+                "Almond": {"whc": 1.5, "solubility": 20, "desc": "Insoluble particles. Gritty if not refined."}
+            }
+            with open(full_path, 'w') as f: json.dump(defaults, f)
+            return defaults
+        st = os.stat(full_path)
+        stamp = (full_path, st.st_mtime_ns, st.st_size)
+        if stamp == self.ing_stamp:
+            self.ing_hits += 1
+        else:
+            self.ing_misses += 1
+            with open(full_path, 'r') as f: self.ing_cache = json.load(f)
+            PERF.add_bytes("io.ingredients", read=st.st_size)
+            self.ing_stamp = stamp
+        return dict(self.ing_cache)
+
+    def cache_stats(self):
+        log = self.history
+        return {"ingredients": {"hits": self.ing_hits, "misses": self.ing_misses},
+                "history": {"hits": log.hits if log else 0, "misses": log.misses if log else 0}}
+
+    @PERF.timed("storage.save_ingredient")
+    def save_ingredient(self, name, data):
+        current = self.load_ingredients()
+        current[name] = data
+        full_path = os.path.join(self.base_path, self.ingredients_file)
+        data = json.dumps(current)
+        with open(full_path + ".tmp", 'w') as f: f.write(data)
+        os.replace(full_path + ".tmp", full_path)
+        PERF.add_bytes("io.ingredients", written=len(data))
+
+    @PERF.timed("storage.save_history_item")
+    def save_history_item(self, record, custom_name=None):
+        if "id" not in record: record["id"] = str(uuid.uuid4())
+        if "pinned" not in record: record["pinned"] = False
+        
+        # Apply custom name if provided, else default
+        if custom_name:
+            record["name"] = custom_name
+        elif "name" not in record:
+            record["name"] = f"{record['source']} Formulation"
+            
+        self._log().put(record)
+        return record["id"]
+
+    @PERF.timed("storage.rename_item")
+    def rename_item(self, item_id, new_name):
+        self._log().update(item_id, name=new_name)
+
+    @PERF.timed("storage.get_history")
+    def get_history(self):
+        return self._log().records()
+
+    def get_item(self, item_id):
+        return self._log().get(item_id)
+
+    @PERF.timed("storage.delete_item")
+    def delete_item(self, item_id):
+        self._log().delete(item_id)
+
+    @PERF.timed("storage.toggle_pin")
+    def toggle_pin(self, item_id):
+        log = self._log()
+        rec = log.get(item_id)
+        if rec is not None: log.update(item_id, pinned=not rec.get("pinned", False))
+
+    @PERF.timed("storage.find_history")
+    def find_history(self, sources=None, similar_to=None, k=5, **ranges):
+        # Served from the columnar index; similar_to is a record (or any dict with the recipe
+        # inputs) and switches the ranking from best score to nearest recipe
+        log = self._log()
+        with log.lock:
+            log._sync()
+            cols = log.columns
+            mask = cols.mask(sources, **ranges)
+            if similar_to is None: hits = [(rid, None) for rid in cols.top(mask, k)]
+            else: hits = cols.nearest(similar_to, mask, k, exclude=similar_to.get("id"))
+            return {"summary": cols.aggregate(mask), "matches": [(log.index[rid], dist) for rid, dist in hits]}
+
+    @PERF.timed("storage.history_stats")
+    def history_stats(self, sources=None, **ranges):
+        log = self._log()
+        with log.lock:
+            log._sync()
+            mask = log.columns.mask(sources, **ranges)
+            return {"summary": log.columns.aggregate(mask), "by_source": log.columns.distribution(mask)}
+
+    def find_by_name(self, name):
+        name = name.strip().lower()
+        return next((h for h in self.get_history() if h.get("name", "").lower() == name), None)
+
+    def _log(self):
+        # One log per storage folder; switching folders (CLOUD mode) opens that folder's log
+        path = os.path.join(self.base_path, self.history_log)
+        if self.history is None or self.history.path != path:
+            self.history = HistoryLog(path, legacy_path=os.path.join(self.base_path, self.history_file))
+        return self.history
+
+class HistoryLog:
+    # Append-only JSONL history: one line per operation (put/update/delete) replayed into an
+    # in-memory id index, so pin/rename/delete append a single line instead of rewriting the file.
+    # Dead lines are dropped by an atomic compaction once they outnumber live records.
+    # Reads are served from the index while the file's (inode, mtime, size) is unchanged; lines
+    # appended by another machine on a shared folder are replayed from the last offset.
+    # Compaction holds a <log>.lock file (O_CREAT|O_EXCL) that appenders wait on, and gives up
+    # if the log changed while the snapshot was written, so other machines' lines survive.
+    LOCK_STALE_S = 30.0
+
+    def __init__(self, path, legacy_path=None, compact_min=1000):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.legacy_path = legacy_path
+        self.compact_min = compact_min
+        self.lock = threading.RLock()
+        self.index = {}
+        self.columns = HistoryIndex()  # numeric mirror of index, updated by every applied op
+        self.lines = 0
+        self.offset = 0  # bytes of the file already replayed into the index
+        self.stamp = None
+        self.hits = 0
+        self.misses = 0
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError: return None
+
+    def _sync(self):
+        stamp = self._stat()
+        if stamp is not None and stamp == self.stamp:
+            self.hits += 1
+            return
+        self.misses += 1
+        if stamp is None and self.legacy_path and os.path.exists(self.legacy_path):
+            with open(self.legacy_path, 'r') as f: legacy = json.load(f)
+            PERF.add_bytes("io.history_legacy", read=os.path.getsize(self.legacy_path))
+            self.index = {h.get("id") or str(uuid.uuid4()): h for h in legacy}
+            for k, h in self.index.items(): h["id"] = k
+            self.columns.load(self.index)
+            if not self.compact():
+                # Another process is importing or compacting: wait for its log and replay that
+                self._wait_unlocked()
+                self.index, self.stamp = {}, None
+                self.columns.clear()
+                if self._stat() is not None: self._sync()
+            return
+        appended = self.stamp is not None and stamp is not None and stamp[0] == self.stamp[0] and stamp[2] > self.offset
+        if not appended:
+            self.index, self.lines, self.offset = {}, 0, 0
+            self.columns.clear()
+        if stamp is not None: self._replay()
+        self.stamp = stamp
+
+    def _replay(self):
+        # Operations are idempotent, so re-reading a line we already applied is harmless
+        start = self.offset
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"): break  # torn tail: left before the offset, re-read once completed
+                self.offset += len(line)
+                op = self._parse(line)
+                if op is None: continue
+                self._apply(op)
+                self.lines += 1
+        PERF.add_bytes("io.history_log", read=self.offset - start)
+
+    @staticmethod
+    def _parse(line):
+        try: return json.loads(line)
+        except ValueError: pass
+        # A writer that crashed mid-line leaves a fragment that the next append continues:
+        # drop the fragment and keep the complete operation after it
+        cut = line.rfind(b'{"op": ')
+        if cut <= 0: return None
+        try: return json.loads(line[cut:])
+        except ValueError: return None
+
+    def _apply(self, op):
+        kind, rid = op.get("op"), op.get("id")
+        if kind == "put":
+            self.index[rid] = op["record"]
+            self.columns.put(rid, op["record"])
+        elif kind == "update" and rid in self.index:
+            self.index[rid].update(op["fields"])
+            self.columns.put(rid, self.index[rid])
+        elif kind == "delete" and self.index.pop(rid, None) is not None:
+            self.columns.drop(rid)
+
+    def _append(self, op):
+        data = json.dumps(op).encode() + b"\n"
+        self._wait_unlocked()
+        with open(self.path, 'ab') as f: f.write(data)
+        PERF.add_bytes("io.history_log", written=len(data))
+        self._apply(op)
+        self.lines += 1
+        stamp = self._stat()
+        if self.stamp is not None and stamp is not None and stamp[0] == self.stamp[0] and stamp[2] == self.stamp[2] + len(data) and self.offset == self.stamp[2]:
+            # Nobody else wrote in between and no torn tail precedes us: our line is already in the index
+            self.offset, self.stamp = stamp[2], stamp
+        if self.lines > max(self.compact_min, 2 * len(self.index)): self.compact()
+
+    def put(self, record):
+        with self.lock:
+            self._sync()
+            self._append({"op": "put", "id": record["id"], "record": record})
+
+    def update(self, rid, **fields):
+        with self.lock:
+            self._sync()
+            if rid in self.index: self._append({"op": "update", "id": rid, "fields": fields})
+
+    def delete(self, rid):
+        with self.lock:
+            self._sync()
+            if rid in self.index: self._append({"op": "delete", "id": rid})
+
+    def get(self, rid):
+        with self.lock:
+            self._sync()
+            return self.index.get(rid)
+
+    def records(self):
+        with self.lock:
+            self._sync()
+            return list(self.index.values())
+
+    def _acquire_file_lock(self):
+        for _ in range(2):
+            try:
+                os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                # A holder that died leaves its lock behind; break it once it is clearly stale
+                try:
+                    if time.time() - os.path.getmtime(self.lock_path) < self.LOCK_STALE_S: return False
+                    os.remove(self.lock_path)
+                except OSError: pass
+            except OSError: return False
+        return False
+
+    def _wait_unlocked(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while os.path.exists(self.lock_path) and time.monotonic() < deadline: time.sleep(0.02)
+
+    def compact(self):
+        # Rewrite as one put per live record; os.replace keeps the old log intact until the swap.
+        # Returns False (log untouched) when another process holds the lock or the log moved on
+        # since our last sync; the next append past the threshold tries again.
+        with self.lock:
+            if not self._acquire_file_lock(): return False
+            tmp = self.path + ".tmp"
+            try:
+                if self._stat() != self.stamp: return False
+                with open(tmp, 'w') as f:
+                    for rid, rec in self.index.items(): f.write(json.dumps({"op": "put", "id": rid, "record": rec}) + "\n")
+                if self._stat() != self.stamp:
+                    os.remove(tmp)
+                    return False
+                os.replace(tmp, self.path)
+            finally:
+                try: os.remove(self.lock_path)
+                except OSError: pass
+            self.stamp = self._stat()
+            self.lines, self.offset = len(self.index), self.stamp[2]
+            PERF.add_bytes("io.history_log", written=self.stamp[2])
+            return True
+
+class HistoryIndex:
+    # Columnar mirror of the history for analytics: one contiguous float array per COLUMNS
+    # entry plus an integer source code per record, so filters, aggregates and neighbour searches are NumPy
+    # passes instead of walks over record dicts. Deletes leave a dead row that is skipped
+    # until dead rows outnumber live ones and the arrays are packed.
+    COLUMNS = ("score", "conc", "fat", "ph", "stab")
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        self.values = np.full((len(self.COLUMNS), self.capacity), np.nan)
+        self.codes = np.full(self.capacity, -1, dtype=np.int32)
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        self.ids = []
+        self.rows = {}
+        self.sources = []
+        self.source_codes = {}
+        self.n = 0
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def load(self, records):
+        self.clear()
+        for rid, rec in records.items(): self.put(rid, rec)
+
+    def _code(self, source):
+        code = self.source_codes.get(source)
+        if code is None:
+            code = self.source_codes[source] = len(self.sources)
+            self.sources.append(source)
+        return code
+
+    def put(self, rid, rec):
+        row = self.rows.get(rid)
+        if row is None:
+            if self.n == len(self.codes): self._grow()
+            row = self.rows[rid] = self.n
+            self.ids.append(rid)
+            self.n += 1
+        for j, col in enumerate(self.COLUMNS):
+            try: self.values[j, row] = float(rec.get(col))
+            except (TypeError, ValueError): self.values[j, row] = np.nan
+        self.codes[row] = self._code(str(rec.get("source", "")))
+        self.alive[row] = True
+
+    def drop(self, rid):
+        row = self.rows.pop(rid, None)
+        if row is None: return
+        self.alive[row] = False
+        self.ids[row] = None
+        self.dead += 1
+        if self.dead > max(self.capacity, len(self.rows)): self._pack()
+
+    def _grow(self):
+        size = 2 * len(self.codes)
+        values = np.full((len(self.COLUMNS), size), np.nan)
+        values[:, :self.n] = self.values[:, :self.n]
+        codes = np.full(size, -1, dtype=np.int32)
+        codes[:self.n] = self.codes[:self.n]
+        alive = np.zeros(size, dtype=bool)
+        alive[:self.n] = self.alive[:self.n]
+        self.values, self.codes, self.alive = values, codes, alive
+
+    def _pack(self):
+        keep = np.flatnonzero(self.alive[:self.n])
+        m = len(keep)
+        self.values[:, :m], self.codes[:m] = self.values[:, keep], self.codes[keep]
+        self.alive[:m], self.alive[m:] = True, False
+        self.ids = [self.ids[i] for i in keep]
+        self.rows = {rid: i for i, rid in enumerate(self.ids)}
+        self.n, self.dead = m, 0
+
+    def column(self, name):
+        return self.values[self.COLUMNS.index(name), :self.n]
+
+    def mask(self, sources=None, **ranges):
+        # sources: names to keep (None = all); ranges: {column: (lo, hi)} inclusive
+        m = self.alive[:self.n].copy()
+        if sources:
+            codes = [self.source_codes[s] for s in sources if s in self.source_codes]
+            m &= np.isin(self.codes[:self.n], codes)
+        for name, (lo, hi) in ranges.items():
+            col = self.column(name)
+            m &= (col >= lo) & (col <= hi)
+        return m
+
+    def aggregate(self, mask):
+        sel = np.compress(mask, self.values[:, :self.n], axis=1)
+        if not sel.shape[1]: return {"count": 0}
+        with np.errstate(all="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN column in legacy records
+            mean, lo, hi = np.nanmean(sel, axis=1), np.nanmin(sel, axis=1), np.nanmax(sel, axis=1)
+        return {"count": int(sel.shape[1]), **{c: {"mean": float(mean[j]), "min": float(lo[j]), "max": float(hi[j])} for j, c in enumerate(self.COLUMNS)}}
+
+    def distribution(self, mask, bins=(40, 60, 80)):
+        # Per-source score quartiles plus counts per band between the bin edges. Bands include their
+        # upper edge (a score of exactly 80 is not premium), matching the sidebar and finalize
+        out = {}
+        score, codes = self.column("score")[mask], self.codes[:self.n][mask]
+        keep = ~np.isnan(score)
+        score, codes = score[keep], codes[keep]
+        for code in np.unique(codes):
+            s = score[codes == code]
+            p25, p50, p75 = np.percentile(s, (25, 50, 75))
+            bands = np.bincount(np.searchsorted(bins, s, side="left"), minlength=len(bins) + 1)
+            out[self.sources[code]] = {"count": int(len(s)), "mean": float(s.mean()), "p25": float(p25), "p50": float(p50), "p75": float(p75),
+                                       "max": float(s.max()), "bands": bands.tolist()}
+        return out
+
+    def top(self, mask, k=5):
+        score = np.where(mask, self.column("score"), -np.inf)
+        score = np.nan_to_num(score, nan=-np.inf)
+        k = min(k, int(mask.sum()))
+        if k <= 0: return []
+        best = np.argpartition(-score, k - 1)[:k]
+        return [self.ids[i] for i in best[np.argsort(-score[best], kind="stable")]]
+
+    def nearest(self, point, mask, k=5, exclude=None):
+        # Euclidean distance over the recipe inputs, each scaled by its INPUT_RANGES span
+        names = list(INPUT_RANGES)
+        cols = [self.COLUMNS.index(c) for c in names]
+        span = np.array([INPUT_RANGES[c][1] - INPUT_RANGES[c][0] for c in names])
+        target = np.array([float(point[c]) for c in names])
+        d = np.sqrt((((self.values[cols, :self.n] - target[:, None]) / span[:, None]) ** 2).sum(axis=0))
+        d = np.where(mask & ~np.isnan(d), d, np.inf)
+        if exclude in self.rows: d[self.rows[exclude]] = np.inf
+        k = min(k, int(np.isfinite(d).sum()))
+        if k <= 0: return []
+        best = np.argpartition(d, k - 1)[:k]
+        best = best[np.argsort(d[best], kind="stable")]
+        return [(self.ids[i], float(d[i])) for i in best]
+
+# ==========================================
+# 3. AI ENGINE
+# ==========================================
+# Synthetic sampling ranges (shared by training and any search over recipes)
+INPUT_RANGES = {"conc": (2.0, 15.0), "fat": (0.5, 6.0), "ph": (3.8, 6.5), "stab": (0.0, 1.2)}
+NUMERIC_FEATURES = ['conc', 'fat', 'ph', 'stab', 'whc', 'sol']
+
+# Builds the whole synthetic dataset as arrays in one pass (same column layout as get_dummies)
+def generate_training_set(ingredient_db, n_samples=2000, seed=None):
+    rng = np.random.default_rng(seed)
+    sources = sorted(ingredient_db.keys())
+    n_num = len(NUMERIC_FEATURES)
+    src_idx = rng.integers(0, len(sources), size=n_samples)
+    base_whc = np.array([ingredient_db[s]['whc'] for s in sources], dtype=float)
+    base_sol = np.array([ingredient_db[s]['solubility'] for s in sources], dtype=float)
+
+    X = np.zeros((n_samples, n_num + len(sources)))
+    conc, fat, ph, stab = (rng.uniform(lo, hi, n_samples) for lo, hi in INPUT_RANGES.values())
+    whc = base_whc[src_idx] + rng.normal(0, 0.2, n_samples)
+    sol = base_sol[src_idx] + rng.normal(0, 5, n_samples)
+    for i, col in enumerate((conc, fat, ph, stab, whc, sol)): X[:, i] = col
+    X[np.arange(n_samples), n_num + src_idx] = 1.0
+
+    # Calibrated Logic
+    score = (conc * 3.5) + (fat * 2.0) + (stab * 30) + (whc * 5.0)
+    acidic = ph < 4.4
+    score -= np.where(acidic & (sol < 50), 20, np.where(acidic, 10, 0))
+    score += np.where(sol > 80, 5, 0)
+    score = np.clip(score, 0, 100) + rng.normal(0, 1, n_samples)
+    y = np.clip(score, 0, 100)
+
+    feature_columns = NUMERIC_FEATURES + [f"source_{s}" for s in sources]
+    return X, y, feature_columns
+
+# Measured lab exports: one row per formulation with source, conc, fat, ph, stab and the label
+# column (score by default). Optional whc / sol (or solubility) columns override the substrate
+# database, which also lets rows of substrates missing from it train under an all-zero one-hot.
+LAB_COLUMNS = ['source', 'conc', 'fat', 'ph', 'stab']
+
+def read_chunks(path, chunk_rows):
+    import pandas as pd
+    if path.endswith((".jsonl", ".ndjson")):
+        return pd.read_json(path, lines=True, chunksize=chunk_rows)
+    return pd.read_csv(path, chunksize=chunk_rows)
+
+def lab_features(chunk, ingredient_db, sources, label="score"):
+    # -> (X float32 in the generate_training_set column layout, y, stratum code per row, rows dropped)
+    chunk = chunk.rename(columns=lambda c: str(c).strip().lower())
+    src = chunk['source'].astype(str).str.strip().str.capitalize()
+    props = {"whc": ("whc", "whc"), "sol": ("sol", "solubility")}
+    extra = []
+    for name, (short, key) in props.items():
+        col = next((c for c in (short, key) if c in chunk.columns), None)
+        values = src.map({k: v[key] for k, v in ingredient_db.items()}).astype(float)
+        if col is not None: values = chunk[col].astype(float).fillna(values)
+        extra.append(values.to_numpy(dtype=float))
+    num = np.column_stack([chunk[c].to_numpy(dtype=float) for c in LAB_COLUMNS[1:]] + extra + [chunk[label].to_numpy(dtype=float)])
+    ok = ~np.isnan(num).any(axis=1)
+    n_num = len(NUMERIC_FEATURES)
+    X = np.zeros((int(ok.sum()), n_num + len(sources)), dtype=np.float32)
+    X[:, :n_num] = num[ok, :n_num]
+    codes = src[ok].map({s: i for i, s in enumerate(sources)}).fillna(len(sources)).to_numpy(dtype=np.int64)
+    known = codes < len(sources)
+    X[np.flatnonzero(known), n_num + codes[known]] = 1.0
+    return X, num[ok, n_num], codes, int((~ok).sum())
+
+class Reservoir:
+    # Uniform sample of at most `capacity` rows from a stream of chunks (Algorithm R, vectorized
+    # per chunk). The buffer grows by doubling, so a sparse stratum never holds its full share.
+    def __init__(self, capacity, width, rng):
+        self.capacity, self.rng = capacity, rng
+        self.X = np.empty((min(capacity, 4096), width), dtype=np.float32)
+        self.y = np.empty(len(self.X))
+        self.size = 0
+        self.seen = 0
+
+    def _reserve(self, rows):
+        if rows <= len(self.X): return
+        size = min(self.capacity, max(rows, 2 * len(self.X)))
+        X, y = np.empty((size, self.X.shape[1]), dtype=np.float32), np.empty(size)
+        X[:self.size], y[:self.size] = self.X[:self.size], self.y[:self.size]
+        self.X, self.y = X, y
+
+    def add(self, X, y):
+        n = len(X)
+        take = min(n, self.capacity - self.size)
+        if take:
+            self._reserve(self.size + take)
+            self.X[self.size:self.size + take], self.y[self.size:self.size + take] = X[:take], y[:take]
+            self.size += take
+        if take < n:
+            # Row t of the stream (0-based) replaces a random slot with probability capacity / (t + 1)
+            t = self.seen + np.arange(take, n)
+            j = (self.rng.random(n - take) * (t + 1)).astype(np.int64)
+            keep = j < self.capacity
+            self.X[j[keep]], self.y[j[keep]] = X[take:][keep], y[take:][keep]
+        self.seen += n
+
+# Radar-chart axes derived from a prediction (works on scalars or arrays)
+def radar_profile(score, stab, conc):
+    score, stab, conc = np.asarray(score, dtype=float), np.asarray(stab, dtype=float), np.asarray(conc, dtype=float)
+    return {
+        "Texture": score,
+        "Stability": np.minimum(100, np.where(stab > 0.4, score * 1.1, score * 0.7)),
+        "Cost": np.maximum(0, 100 - (conc * 5)),
+        "Nutrition": np.minimum(100, conc * 8)
+    }
+
+class CompiledForest:
+    # A fitted forest flattened into contiguous arrays (feature, threshold, children, value).
+    # children holds [left, right] per node and leaves point back to themselves, so evaluation is
+    # a fixed number of vectorized gather steps (the deepest tree's depth) with no sklearn overhead.
+    # Small batches walk every row x tree pair at once; large ones go tree by tree over the rows,
+    # which keeps the scratch arrays in cache.
+    ARRAYS = ("feature", "threshold", "children", "value", "roots")
+    TREE_MAJOR_ROWS = 2048
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth):
+        self.feature, self.threshold, self.children = feature, threshold, children
+        self.value, self.roots, self.max_depth = value, roots, int(max_depth)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        parts = {k: [] for k in cls.ARRAYS}
+        offset, depth = 0, 0
+        for est in forest.estimators_:
+            t = est.tree_
+            ids = np.arange(offset, offset + t.node_count, dtype=np.int32)
+            leaf = t.children_left == -1
+            parts["feature"].append(np.where(leaf, 0, t.feature).astype(np.int32))
+            parts["threshold"].append(t.threshold.astype(np.float64))
+            parts["children"].append(np.column_stack([np.where(leaf, ids, t.children_left + offset),
+                                                      np.where(leaf, ids, t.children_right + offset)]).astype(np.int32).ravel())
+            parts["value"].append(t.value[:, 0, 0].astype(np.float64))
+            parts["roots"].append(np.array([offset], dtype=np.int32))
+            offset += t.node_count
+            depth = max(depth, t.max_depth)
+        return cls(*(np.concatenate(parts[k]) for k in cls.ARRAYS), depth)
+
+    def _step(self, flat, base, node):
+        # One level down: sklearn compares float32 inputs against float64 thresholds, and so do we
+        return self.children[2 * node + (flat[base + self.feature[node]] > self.threshold[node])]
+
+    def predict(self, X, chunk_rows=None):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if len(X) >= self.TREE_MAJOR_ROWS:
+            # Same step as _step, written into preallocated buffers (np.take with out=)
+            n = len(X)
+            flat, base = X.ravel(), np.arange(n, dtype=np.int64) * X.shape[1]
+            total, idx, feat, x, thr, right = np.zeros(n), np.empty(n, np.int64), np.empty(n, np.int32), np.empty(n, np.float32), np.empty(n), np.empty(n, bool)
+            for root in self.roots:
+                node = np.full(n, root, dtype=np.int32)
+                for _ in range(self.max_depth):
+                    np.take(self.feature, node, out=feat)
+                    np.add(base, feat, out=idx)
+                    np.take(flat, idx, out=x)
+                    np.take(self.threshold, node, out=thr)
+                    np.greater(x, thr, out=right)
+                    node *= 2
+                    node += right
+                    np.take(self.children, node, out=node)
+                total += np.take(self.value, node)
+            return total / len(self.roots)
+        n_trees = len(self.roots)
+        chunk_rows = chunk_rows or max(1, 2_000_000 // n_trees)  # bounds the (rows x trees) scratch arrays
+        out = np.empty(len(X))
+        for start in range(0, len(X), chunk_rows):
+            out[start:start + chunk_rows] = self.value[self._leaves(X[start:start + chunk_rows])].mean(axis=1)
+        return out
+
+    def predict_trees(self, X):
+        # (rows, trees) matrix of individual tree outputs; meant for small batches
+        return self.value[self._leaves(np.ascontiguousarray(X, dtype=np.float32))]
+
+    def _leaves(self, X):
+        flat, base = X.ravel(), (np.arange(len(X), dtype=np.int64) * X.shape[1])[:, None]
+        node = np.repeat(self.roots[None, :], len(X), axis=0)
+        for _ in range(self.max_depth): node = self._step(flat, base, node)
+        return node
+
+def save_compiled(path, arrays, meta):
+    # Single memory-mappable file: magic, header length, JSON header, then 64-byte aligned raw arrays
+    header = {"meta": meta, "arrays": {}}
+    offset = 0
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        header["arrays"][name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += (arr.nbytes + 63) // 64 * 64
+    blob = json.dumps(header).encode()
+    start = (16 + len(blob) + 63) // 64 * 64
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(b"PBFOREST" + len(blob).to_bytes(8, "little") + blob)
+        for name, arr in arrays.items():
+            f.seek(start + header["arrays"][name]["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+def load_compiled(path):
+    with open(path, 'rb') as f:
+        if f.read(8) != b"PBFOREST": raise ValueError(f"{path} is not a compiled PlantBot model")
+        size = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(size))
+    start = (16 + size + 63) // 64 * 64
+    arrays = {name: np.memmap(path, dtype=np.dtype(spec["dtype"]), mode='r', offset=start + spec["offset"], shape=tuple(spec["shape"]))
+              for name, spec in header["arrays"].items()}
+    return arrays, header["meta"]
+
+class AIModel:
+    def __init__(self):
+        # Estimators are created on first train so constructing an AIModel never imports sklearn
+        self.params = {"n_estimators": 100, "random_state": 42}
+        self.model = None
+        self.scaler = None
+        self.is_trained = False
+        self.feature_columns = None
+        self.n_samples = 2000
+        self.seed = 42
+        self.extensions = {}  # source -> forest fitted incrementally on that source's rows only
+        # Extensions are kept small (~0.3 MB each) and folded into a full retrain past max_extensions
+        self.ext_params = {"n_estimators": 30, "max_depth": 10, "min_samples_leaf": 3}
+        self.max_extensions = 16
+        self.base_key = None  # fingerprint the base model was trained under
+        self.ext_keys = {}  # source -> cache key of its extension forest
+        self.compiled = None  # array-backed copies of the forests used for inference (see compile())
+        self.compiled_max_rows = 256
+        self.lab = None  # measured-data settings (see use_lab_data); None trains on synthetic rows
+        self.reports = OrderedDict()  # explain() results per formulation, least recently used first
+        self.max_reports = 512
+
+    @PERF.timed("ai.train")
+    def train(self, ingredient_db, n_samples=None, seed=None):
+        # Full rebuild: every source is resampled and the base forest refitted
+        if n_samples is not None: self.n_samples = n_samples
+        if seed is not None: self.seed = seed
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.preprocessing import StandardScaler
+        X, y, self.feature_columns = generate_training_set(ingredient_db, self.n_samples, self.seed)
+        self.model = RandomForestRegressor(**self.params)
+        self.scaler = StandardScaler()
+        X_scaled = self.scaler.fit_transform(X)
+        self.model.fit(X_scaled, y)
+        self.extensions, self.ext_keys = {}, {}
+        self.base_key = self.fingerprint(ingredient_db)
+        self.reports.clear()
+        self._index_features()
+        self.compile()
+        self.is_trained = True
+
+    # Approximate peak bytes per sampled training row while fitting, measured on this model:
+    # a fully grown forest costs ~90 B/row per tree plus ~70 B for its compiled copy; the
+    # histogram booster bins features to uint8 and stays under 250 B/row whatever its size.
+    FIT_BYTES_PER_ROW = {"forest": 160, "hist": 250}
+
+    def use_lab_data(self, files, memory_mb=256, estimator="forest", stratify=True, label="score", chunk_rows=50_000):
+        # Switches train_lab to measured data; estimator "hist" fits HistGradientBoostingRegressor
+        if estimator not in self.FIT_BYTES_PER_ROW: raise ValueError(f"Unknown estimator: {estimator}")
+        self.lab = {"files": [os.path.abspath(f) for f in files], "memory_mb": memory_mb, "estimator": estimator,
+                    "stratify": stratify, "label": label, "chunk_rows": chunk_rows}
+
+    def lab_budget(self, width):
+        # -> (sample rows, chunk rows). A parsed chunk (pandas frame, string-normalized sources,
+        # float64 staging and float32 features: ~500 B/row) gets at most a quarter of the cap; the
+        # rest is divided by a sampled row's float32 features + label (held twice: reservoirs and
+        # their concatenation) plus the estimator's fitting cost
+        lab = self.lab
+        cap = lab["memory_mb"] * 1024 * 1024
+        chunk_rows = max(1000, min(lab["chunk_rows"], cap // 4 // (width * 4 + 500)))
+        fit = self.FIT_BYTES_PER_ROW[lab["estimator"]] * (self.params["n_estimators"] if lab["estimator"] == "forest" else 1)
+        rows = (cap - chunk_rows * (width * 4 + 500)) // (2 * (width * 4 + 8) + fit)
+        if rows < 100: raise ValueError(f"memory_mb={lab['memory_mb']} leaves room for only {max(0, rows)} training rows")
+        return int(rows), int(chunk_rows)
+
+    @PERF.timed("ai.train_lab")
+    def train_lab(self, ingredient_db, progress=None):
+        # One pass over the lab files: the scaler sees every row (partial_fit) while a reservoir,
+        # or one per source when stratified, keeps the subsample the model is fitted on
+        report = progress or (lambda msg: None)
+        lab = self.lab
+        from sklearn.preprocessing import StandardScaler
+        sources = sorted(ingredient_db.keys())
+        self.feature_columns = NUMERIC_FEATURES + [f"source_{s}" for s in sources]
+        width = len(self.feature_columns)
+        capacity, chunk_rows = self.lab_budget(width)
+        rng = np.random.default_rng(self.seed)
+        strata = len(sources) + 1 if lab["stratify"] else 1  # last stratum: substrates not in the database
+        pools = [Reservoir(max(1, capacity // strata), width, rng) for _ in range(strata)]
+        self.scaler = StandardScaler()
+        rows = dropped = 0
+        for path in lab["files"]:
+            for chunk in read_chunks(path, chunk_rows):
+                X, y, codes, bad = lab_features(chunk, ingredient_db, sources, lab["label"])
+                dropped += bad
+                if not len(X): continue
+                self.scaler.partial_fit(X)
+                if strata == 1: pools[0].add(X, y)
+                else:
+                    for code in np.unique(codes):
+                        sel = codes == code
+                        pools[code].add(X[sel], y[sel])
+                rows += len(X)
+                report(f"Streamed {rows:,} lab rows...")
+        if rows == 0: raise ValueError("No usable rows in the lab files (need source, conc, fat, ph, stab and " + lab["label"] + ")")
+        X = np.concatenate([p.X[:p.size] for p in pools])
+        y = np.concatenate([p.y[:p.size] for p in pools])
+        pools = None
+        X -= self.scaler.mean_.astype(np.float32)  # scaled in place: no float64 copy of the sample
+        X /= self.scaler.scale_.astype(np.float32)
+        report(f"Fitting on {len(X):,} of {rows:,} rows ({dropped:,} incomplete rows skipped)...")
+        if lab["estimator"] == "hist":
+            from sklearn.ensemble import HistGradientBoostingRegressor
+            self.model = HistGradientBoostingRegressor(random_state=self.params.get("random_state"))
+        else:
+            from sklearn.ensemble import RandomForestRegressor
+            self.model = RandomForestRegressor(**self.params)
+        self.model.fit(X, y)
+        self.extensions, self.ext_keys = {}, {}
+        self.base_key = self.fingerprint(ingredient_db)
+        self.reports.clear()
+        self._index_features()
+        self.compile()
+        self.is_trained = True
+
+    @PERF.timed("ai.add_source")
+    def add_source(self, name, props, n_samples=None):
+        # Incremental path: sample only the new (or re-characterized) source and fit a forest
+        # on it alone; its rows are routed there at predict time, the base forest is untouched.
+        added = self.added_sources()
+        n_sources = len(set(self._source_index) | added | {name})
+        n = n_samples or max(200, self.n_samples // n_sources)
+        seed = self.seed + len(added) + 1
+        X, y, _ = generate_training_set({name: props}, n, seed)
+        num = self._num_cols
+        X_scaled = (X[:, :len(NUMERIC_FEATURES)] - self._mean[num]) / self._scale[num]
+        from sklearn.ensemble import RandomForestRegressor
+        forest = RandomForestRegressor(random_state=self.params.get("random_state"), **self.ext_params)
+        forest.fit(X_scaled, y)
+        self.extensions[name] = forest
+        key = {"base": self.base_key, "name": name, "props": props, "n": n, "seed": seed, "params": self.ext_params}
+        self.ext_keys[name] = hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:20]
+        self.reports.clear()
+        if self.compiled: self.compiled["extensions"][name] = CompiledForest.from_sklearn(forest)
+
+    def added_sources(self):
+        # Substrates served by extension forests (sklearn or compiled; either may be released)
+        return set(self.extensions) | set(self.compiled["extensions"] if self.compiled else ())
+
+    def clone(self):
+        # Shares the (read-only) fitted base forest; extensions can grow without touching the original
+        twin = copy.copy(self)
+        twin.extensions = dict(self.extensions)
+        twin.ext_keys = dict(self.ext_keys)
+        twin.reports = OrderedDict()
+        if self.compiled: twin.compiled = {"base": self.compiled["base"], "extensions": dict(self.compiled["extensions"])}
+        return twin
+
+    def compile(self):
+        # Flattens the fitted forests; predict_many then evaluates these arrays instead of calling sklearn.
+        # A boosted base model has no estimators_ to flatten and keeps predicting through sklearn.
+        if self.model is None and self.compiled: return  # already released: the arrays are all there is
+        if not hasattr(self.model, "estimators_"):
+            self.compiled = None
+            return
+        self.compiled = {"base": CompiledForest.from_sklearn(self.model),
+                         "extensions": {k: CompiledForest.from_sklearn(f) for k, f in self.extensions.items()}}
+
+    def release_estimators(self):
+        # Inference from here on runs on the compiled arrays only; dropping the sklearn forests
+        # roughly halves resident model memory. Large batches (the optimizer's grids) take ~2x
+        # longer than sklearn's C loop, single rows stay ~30x faster. Cache the model first.
+        if not self.compiled: return
+        self.model = None
+        self.extensions = {}
+
+    def export_compiled(self, path):
+        if not self.compiled: self.compile()
+        if not self.compiled: raise ValueError("Only forest models can be compiled")
+        forests = {"base": self.compiled["base"], **{f"ext:{k}": f for k, f in self.compiled["extensions"].items()}}
+        arrays = {"mean": self._mean, "scale": self._scale}
+        for tag, forest in forests.items():
+            for k in CompiledForest.ARRAYS: arrays[f"{tag}/{k}"] = getattr(forest, k)
+        meta = {"feature_columns": list(self.feature_columns), "forests": {tag: f.max_depth for tag, f in forests.items()}}
+        save_compiled(path, arrays, meta)
+
+    @classmethod
+    def load_compiled(cls, path):
+        # Inference-only model backed by read-only memory maps; no sklearn import, pages load on demand
+        arrays, meta = load_compiled(path)
+        forests = {tag: CompiledForest(*(arrays[f"{tag}/{k}"] for k in CompiledForest.ARRAYS), depth) for tag, depth in meta["forests"].items()}
+        ai = cls()
+        ai.feature_columns = meta["feature_columns"]
+        ai.compiled = {"base": forests.pop("base"), "extensions": {tag[len("ext:"):]: f for tag, f in forests.items()}}
+        ai._index_features()
+        ai._mean, ai._scale = np.asarray(arrays["mean"]), np.asarray(arrays["scale"])
+        ai.is_trained = True
+        return ai
+
+    def fingerprint(self, ingredient_db):
+        # Anything that changes the fitted model must change this key
+        key = {"db": ingredient_db, "params": self.params, "n_samples": self.n_samples,
+               "seed": self.seed, "sklearn": _sklearn_version()}
+        if self.lab:
+            # Measured data: the files' sizes and mtimes stand in for their contents
+            stats = [os.stat(f) for f in self.lab["files"]]
+            key["lab"] = {**self.lab, "files": [(f, st.st_size, st.st_mtime_ns) for f, st in zip(self.lab["files"], stats)]}
+        return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:20]
+
+    def export_state(self):
+        return {"model": self.model, "scaler": self.scaler, "feature_columns": list(self.feature_columns), "extensions": self.extensions,
+                "base_key": self.base_key, "ext_keys": self.ext_keys}
+
+    def load_state(self, state):
+        self.model, self.scaler, self.feature_columns = state["model"], state["scaler"], state["feature_columns"]
+        self.extensions = state.get("extensions", {})
+        self.base_key, self.ext_keys = state.get("base_key"), dict(state.get("ext_keys", {}))
+        self.reports.clear()
+        self._index_features()
+        self.compile()
+        self.is_trained = True
+
+    def _index_features(self):
+        # Column positions resolved once per training, not once per prediction
+        self._num_index = {c: i for i, c in enumerate(self.feature_columns) if not c.startswith('source_')}
+        self._source_index = {c[len('source_'):]: i for i, c in enumerate(self.feature_columns) if c.startswith('source_')}
+        self._num_cols = [self._num_index[c] for c in NUMERIC_FEATURES]
+        if self.scaler is not None: self._mean, self._scale = self.scaler.mean_, self.scaler.scale_
+
+    def build_features(self, inputs, sources):
+        # inputs: (N, len(NUMERIC_FEATURES)) array in NUMERIC_FEATURES order, or a {column: values} mapping
+        if isinstance(sources, str): sources = [sources]
+        n = len(sources)
+        X = np.zeros((n, len(self.feature_columns)))
+        if isinstance(inputs, dict):
+            for col, vals in inputs.items():
+                if col in self._num_index: X[:, self._num_index[col]] = vals
+        else:
+            arr = np.asarray(inputs, dtype=float).reshape(n, -1)
+            for j, col in enumerate(NUMERIC_FEATURES): X[:, self._num_index[col]] = arr[:, j]
+        src_cols = np.array([self._source_index.get(s, -1) for s in sources], dtype=int)
+        known = src_cols >= 0  # unknown sources keep an all-zero one-hot
+        X[np.flatnonzero(known), src_cols[known]] = 1.0
+        return X
+
+    @PERF.timed("ai.predict_many")
+    def predict_many(self, inputs, sources):
+        if isinstance(sources, str): sources = [sources]
+        if not self.is_trained: return np.zeros(len(sources))
+        X = self.build_features(inputs, sources)
+        X_scaled = (X - self._mean) / self._scale
+        # Compiled arrays win on small batches (no per-call sklearn overhead); sklearn's C loop wins on big ones
+        use_compiled = self.compiled and (self.model is None or len(X) <= self.compiled_max_rows)
+        base, extensions = (self.compiled["base"], self.compiled["extensions"]) if use_compiled else (self.model, self.extensions)
+        if not extensions: return base.predict(X_scaled)
+        src = np.asarray(sources, dtype=object)
+        out = np.empty(len(src))
+        on_base = np.ones(len(src), dtype=bool)
+        for name, forest in extensions.items():
+            rows = src == name
+            if rows.any():
+                out[rows] = forest.predict(X_scaled[rows][:, self._num_cols])
+                on_base &= ~rows
+        if on_base.any(): out[on_base] = base.predict(X_scaled[on_base])
+        return out
+
+    @PERF.timed("ai.predict")
+    def predict(self, inputs, source_name):
+        if not self.is_trained: return 0
+        return self.predict_many({k: [v] for k, v in inputs.items()}, [source_name])[0]
+
+    def predict_trees(self, inputs, source_name):
+        # inputs: (N, len(NUMERIC_FEATURES)) array. Per-tree outputs (N, trees) from the compiled
+        # forest serving source_name, or None when that model is not a forest (boosted base)
+        if not self.compiled: return None
+        X = self.build_features(inputs, [source_name] * len(inputs))
+        X_scaled = (X - self._mean) / self._scale
+        forest = self.compiled["extensions"].get(source_name)
+        if forest is not None: return forest.predict_trees(X_scaled[:, self._num_cols])
+        return self.compiled["base"].predict_trees(X_scaled)
+
+    @PERF.timed("ai.explain")
+    def explain(self, inputs, source_name, points=9, coverage=90):
+        # Score with a tree-spread interval, plus one curve per recipe input swept across
+        # INPUT_RANGES with the others held fixed. The point itself and all sweeps go through
+        # the forest as one batch; results are kept per formulation until the model is replaced.
+        key = (source_name, points, coverage) + tuple(round(float(inputs[k]), 6) for k in NUMERIC_FEATURES)
+        if key in self.reports:
+            self.reports.move_to_end(key)
+            return self.reports[key]
+        names = list(INPUT_RANGES)
+        base = np.array([float(inputs[k]) for k in NUMERIC_FEATURES])
+        X = np.repeat(base[None, :], 1 + len(names) * points, axis=0)
+        grids = {k: np.linspace(*INPUT_RANGES[k], points) for k in names}
+        for i, k in enumerate(names): X[1 + i * points:1 + (i + 1) * points, NUMERIC_FEATURES.index(k)] = grids[k]
+        trees = self.predict_trees(X, source_name)
+        if trees is None: trees = self.predict_many(X, [source_name] * len(X))[:, None]  # no spread available
+        tail = (100 - coverage) / 2
+        mean, low, high = trees.mean(axis=1), np.percentile(trees, tail, axis=1), np.percentile(trees, 100 - tail, axis=1)
+        curves = {}
+        for i, k in enumerate(names):
+            sl = slice(1 + i * points, 1 + (i + 1) * points)
+            curves[k] = {"x": grids[k].tolist(), "mean": mean[sl].tolist(), "low": low[sl].tolist(), "high": high[sl].tolist()}
+        report = {"score": float(mean[0]), "low": float(low[0]), "high": float(high[0]), "std": float(trees[0].std()),
+                  "trees": trees.shape[1], "coverage": coverage, "curves": curves}
+        self.reports[key] = report
+        if len(self.reports) > self.max_reports: self.reports.popitem(last=False)
+        return report
+
+def local_cache_root():
+    # Per-user folder on this machine. Cached models are pickles, and unpickling runs code, so they
+    # must never be read from the (possibly shared) storage folder. PLANTBOT_CACHE_DIR overrides.
+    if os.environ.get("PLANTBOT_CACHE_DIR"): return os.environ["PLANTBOT_CACHE_DIR"]
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "plantbot")
+
+class ModelCache:
+    # Trained models in a local cache folder (see local_cache_root), keyed by AIModel.fingerprint,
+    # which covers the ingredient database, so one folder serves every storage location.
+    # The base model is stored once per AIModel.base_key and each extension forest in its own
+    # small file, so adding a substrate writes only that forest plus a manifest (keyed by the
+    # full fingerprint) listing the pieces.
+    def __init__(self, root=None, max_bytes=256 * 1024 * 1024):
+        self.root = root or local_cache_root()
+        self.dir_name = "model_cache"
+        self.max_bytes = max_bytes
+
+    def cache_dir(self):
+        return os.path.join(self.root, self.dir_name)
+
+    def _path(self, key, kind="model", ext="pkl"):
+        return os.path.join(self.cache_dir(), f"{kind}_{key}.{ext}")
+
+    @PERF.timed("model_cache.load")
+    def load(self, ai, ingredient_db):
+        fp = ai.fingerprint(ingredient_db)
+        manifest = self._path(fp, "manifest", "json")
+        try:
+            if os.path.exists(manifest):
+                with open(manifest, 'r') as f: parts = json.load(f)
+                base, ext_keys = parts["base"], parts["extensions"]
+            else: base, ext_keys = fp, {}
+            paths = [self._path(base)] + [self._path(k, "ext") for k in ext_keys.values()]
+            if not all(os.path.exists(p) for p in paths): return False
+            with open(paths[0], 'rb') as f: state = pickle.load(f)
+            extensions = dict(state.get("extensions", {}))
+            for name, path in zip(ext_keys, paths[1:]):
+                with open(path, 'rb') as f: extensions[name] = pickle.load(f)
+            ai.load_state({**state, "extensions": extensions, "base_key": base, "ext_keys": ext_keys})
+        except Exception: return False
+        for path in paths + ([manifest] if ext_keys else []):
+            PERF.add_bytes("io.model_cache", read=os.path.getsize(path))
+            try: os.utime(path)  # mark as recently used for eviction
+            except OSError: pass
+        return True
+
+    def _write(self, path, obj):
+        # Entries are immutable per key: an existing file is only touched, never rewritten
+        if os.path.exists(path):
+            os.utime(path)
+            return
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            if path.endswith(".json"): f.write(json.dumps(obj).encode())
+            else: pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        PERF.add_bytes("io.model_cache", written=os.path.getsize(path))
+
+    @PERF.timed("model_cache.save")
+    def save(self, ai, ingredient_db):
+        fp = ai.fingerprint(ingredient_db)
+        base = ai.base_key or fp
+        try:
+            os.makedirs(self.cache_dir(), exist_ok=True)
+            if ai.model is not None:  # a released model can only reference pieces already on disk
+                self._write(self._path(base), {"model": ai.model, "scaler": ai.scaler, "feature_columns": list(ai.feature_columns),
+                                               "extensions": {k: f for k, f in ai.extensions.items() if k not in ai.ext_keys}})
+            for name, key in ai.ext_keys.items():
+                if name in ai.extensions: self._write(self._path(key, "ext"), ai.extensions[name])
+            if ai.ext_keys and fp != base: self._write(self._path(fp, "manifest", "json"), {"base": base, "extensions": ai.ext_keys})
+        except OSError: return
+        self.evict()
+
+    def evict(self):
+        # Keep the most recently used entries within max_bytes (the newest one always survives)
+        d = self.cache_dir()
+        entries = []
+        for name in os.listdir(d):
+            if name.startswith(("model_", "ext_", "manifest_")) and name.endswith((".pkl", ".json")):
+                st = os.stat(os.path.join(d, name))
+                entries.append((st.st_mtime, st.st_size, name))
+        entries.sort(reverse=True)
+        total = 0
+        for i, (_, size, name) in enumerate(entries):
+            total += size
+            if i > 0 and total > self.max_bytes:
+                try: os.remove(os.path.join(d, name))
+                except OSError: pass
+
+    def with_estimators(self, ai):
+        # For large-batch jobs on a released model: a clone with its sklearn forests read back
+        # from the cache, dropped again when the job lets go of it. Falls back to ai as is.
+        if ai.model is not None or not ai.base_key: return ai
+        paths = [self._path(ai.base_key)] + [self._path(k, "ext") for k in ai.ext_keys.values()]
+        if not all(os.path.exists(p) for p in paths): return ai
+        try:
+            with open(paths[0], 'rb') as f: state = pickle.load(f)
+            extensions = dict(state.get("extensions", {}))
+            for name, path in zip(ai.ext_keys, paths[1:]):
+                with open(path, 'rb') as f: extensions[name] = pickle.load(f)
+        except Exception: return ai
+        if set(extensions) != ai.added_sources(): return ai  # routing must match the compiled model
+        twin = ai.clone()
+        twin.model, twin.extensions = state["model"], extensions
+        return twin
+
+    def load_or_train(self, ai, ingredient_db, progress=None, force=False):
+        report = progress or (lambda msg: None)
+        if not force and self.load(ai, ingredient_db):
+            report("Loaded cached model.")
+            return True
+        if ai.lab:
+            report(f"Streaming {len(ai.lab['files'])} lab file(s)...")
+            ai.train_lab(ingredient_db, progress=report)
+        else:
+            report(f"Training on {ai.n_samples} samples across {len(ingredient_db)} substrates...")
+            ai.train(ingredient_db)
+        report("Caching model...")
+        self.save(ai, ingredient_db)
+        return False
+
+    def load_or_extend(self, ai, ingredient_db, name, progress=None):
+        report = progress or (lambda msg: None)
+        if self.load(ai, ingredient_db):
+            report("Loaded cached model.")
+            return True
+        added = ai.added_sources() | {name}
+        if not ai.lab and len(added) > ai.max_extensions:
+            # Past the cap, one full retrain folds every added substrate into the base forest
+            report(f"Folding {len(added)} added substrates into the base model...")
+            return self.load_or_train(ai, ingredient_db, progress)
+        report(f"Fitting {name} incrementally...")
+        ai.add_source(name, ingredient_db[name])
+        report("Caching model...")
+        self.save(ai, ingredient_db)
+        return False
+
+class FormulationOptimizer:
+    # Searches INPUT_RANGES for the best-scoring recipes of one source:
+    # a coarse grid over conc/fat/pH/stab, then a few rounds of shrinking local grids around the leaders.
+    # The default 32-point grid scores ~1M candidates (plus ~60k refinements) in batch_size chunks.
+    GRID_LIMITS = (5, 40)  # 40 points per input is 2.56M candidates, ~80 MB of them
+    def __init__(self, ai, batch_size=200_000):
+        self.ai = ai
+        self.batch_size = batch_size
+        self.inputs = list(INPUT_RANGES.keys())
+
+    def score(self, source, props, candidates):
+        # candidates: (N, 4) array in INPUT_RANGES order; scored in batches through predict_many
+        out = np.empty(len(candidates))
+        fixed = np.array([props['whc'], props['solubility']], dtype=float)
+        for start in range(0, len(candidates), self.batch_size):
+            chunk = candidates[start:start + self.batch_size]
+            X = np.hstack([chunk, np.broadcast_to(fixed, (len(chunk), 2))])
+            out[start:start + len(chunk)] = self.ai.predict_many(X, [source] * len(chunk))
+        return out
+
+    def feasible(self, candidates, scores, chart_bounds):
+        mask = np.ones(len(candidates), dtype=bool)
+        if chart_bounds:
+            col = {k: i for i, k in enumerate(self.inputs)}
+            axes = radar_profile(scores, candidates[:, col['stab']], candidates[:, col['conc']])
+            for axis, (lo, hi) in chart_bounds.items():
+                mask &= (axes[axis] >= lo) & (axes[axis] <= hi)
+        return mask
+
+    def optimize(self, source, props, bounds=None, chart_bounds=None, top_k=5, grid=32, seeds=32, refine_rounds=3, refine_grid=5):
+        # bounds: {input: (lo, hi)} narrowing INPUT_RANGES; chart_bounds: {radar axis: (lo, hi)}
+        box = {k: (bounds or {}).get(k, INPUT_RANGES[k]) for k in self.inputs}
+        lo = np.array([max(INPUT_RANGES[k][0], box[k][0]) for k in self.inputs])
+        hi = np.array([min(INPUT_RANGES[k][1], box[k][1]) for k in self.inputs])
+        if np.any(lo > hi): return []
+
+        axes = [np.linspace(l, h, grid) for l, h in zip(lo, hi)]
+        cands = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(self.inputs))
+        scores = self.score(source, props, cands)
+        keep = self.feasible(cands, scores, chart_bounds)
+        cands, scores = cands[keep], scores[keep]
+
+        step = (hi - lo) / max(1, grid - 1)
+        offsets = np.stack(np.meshgrid(*[np.linspace(-1, 1, refine_grid)] * len(self.inputs), indexing='ij'), axis=-1).reshape(-1, len(self.inputs))
+        for _ in range(refine_rounds):
+            if len(cands) == 0: break
+            lead = cands[np.argsort(scores)[::-1][:seeds]]
+            local = np.clip((lead[:, None, :] + offsets[None, :, :] * step).reshape(-1, len(self.inputs)), lo, hi)
+            local_scores = self.score(source, props, local)
+            ok = self.feasible(local, local_scores, chart_bounds)
+            cands = np.vstack([cands, local[ok]])
+            scores = np.concatenate([scores, local_scores[ok]])
+            step = step / 2
+
+        # Top-k, skipping near-duplicates of an already chosen recipe (within one coarse grid cell)
+        results, chosen = [], []
+        span = np.where(hi > lo, hi - lo, 1.0)
+        for i in np.argsort(scores)[::-1]:
+            if any(np.all(np.abs(cands[i] - c) / span < 1.0 / grid) for c in chosen): continue
+            chosen.append(cands[i])
+            rec = {k: round(float(v), 2) for k, v in zip(self.inputs, cands[i])}
+            results.append({"source": source, **rec, "score": float(scores[i])})
+            if len(results) == top_k: break
+        return results
@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from plantbot_core import AIModel, CompiledForest, NUMERIC_FEATURES, StorageManager
+
+# ==========================================
+# COMPILED FOREST vs. SKLEARN
+# ==========================================
+# Run with pytest, or directly: python tests/test_compiled_forest.py
+TOL = 1e-9
+
+def _fitted_forest(n_features=6, seed=0):
+    from sklearn.ensemble import RandomForestRegressor
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(1500, n_features))
+    y = X[:, 0] * 3 - X[:, 1] ** 2 + np.sin(X[:, 2]) + rng.normal(scale=0.1, size=len(X))
+    return RandomForestRegressor(n_estimators=20, max_depth=8, random_state=seed).fit(X, y), rng
+
+def test_matches_sklearn_on_small_and_large_batches():
+    forest, rng = _fitted_forest()
+    compiled = CompiledForest.from_sklearn(forest)
+    for rows in (1, 7, CompiledForest.TREE_MAJOR_ROWS - 1, CompiledForest.TREE_MAJOR_ROWS, 5000):
+        X = rng.normal(size=(rows, 6))
+        assert np.allclose(compiled.predict(X), forest.predict(X), rtol=0, atol=TOL), rows
+    X = rng.normal(size=(300, 6))
+    assert np.allclose(compiled.predict(X, chunk_rows=17), forest.predict(X), rtol=0, atol=TOL)
+
+def test_tree_outputs_average_to_the_prediction():
+    forest, rng = _fitted_forest(seed=1)
+    compiled = CompiledForest.from_sklearn(forest)
+    X = rng.normal(size=(50, 6))
+    trees = compiled.predict_trees(X)
+    assert trees.shape == (50, len(forest.estimators_))
+    expected = np.column_stack([t.predict(X.astype(np.float32)) for t in forest.estimators_])
+    assert np.allclose(trees, expected, rtol=0, atol=TOL)
+    assert np.allclose(trees.mean(axis=1), forest.predict(X), rtol=0, atol=TOL)
+
+def test_export_and_load_compiled_round_trip():
+    with tempfile.TemporaryDirectory() as d:
+        cwd = os.getcwd()
+        os.chdir(d)  # StorageManager writes its default ingredient file to the working folder
+        try: db = StorageManager().load_ingredients()
+        finally: os.chdir(cwd)
+        ai = AIModel()
+        ai.train(db, n_samples=600, seed=3)
+        ai.add_source("Hemp", {"whc": 2.8, "solubility": 45}, n_samples=300)
+        ai.compile()
+        rng = np.random.default_rng(3)
+        sources = list(db) + ["Hemp"]
+        n = 3000
+        inputs = {c: rng.uniform(0.5, 10.0, n) for c in NUMERIC_FEATURES}
+        src = [sources[i % len(sources)] for i in range(n)]
+        X = ai.build_features(inputs, src)
+        X_scaled = (X - ai._mean) / ai._scale
+        rows = np.array(src) == "Hemp"
+        expected = ai.model.predict(X_scaled)
+        expected[rows] = ai.extensions["Hemp"].predict(X_scaled[rows][:, ai._num_cols])
+        assert np.allclose(ai.predict_many(inputs, src), expected, rtol=0, atol=TOL)
+        path = os.path.join(d, "model.pbforest")
+        ai.export_compiled(path)
+        loaded = AIModel.load_compiled(path)
+        assert loaded.model is None and set(loaded.compiled["extensions"]) == {"Hemp"}
+        assert np.allclose(loaded.predict_many(inputs, src), expected, rtol=0, atol=TOL)
+        assert np.allclose(loaded.predict_many({c: v[:5] for c, v in inputs.items()}, src[:5]), expected[:5], rtol=0, atol=TOL)
+        del loaded  # release the memory maps before the folder is removed
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"ok  {name}")
@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from plantbot_core import HistoryLog
+
+# ==========================================
+# HISTORY LOG ROUND-TRIPS
+# ==========================================
+# Run with pytest, or directly: python tests/test_history_log.py
+
+def _record(rid, score, **extra):
+    return {"id": rid, "name": f"Recipe {rid}", "source": "Pea", "conc": 8.0, "fat": 3.0, "ph": 4.5, "stab": 0.4, "score": score, **extra}
+
+def _reopen(path):
+    return {r["id"]: r for r in HistoryLog(path).records()}
+
+def test_legacy_import_then_edits_survive_reopen():
+    with tempfile.TemporaryDirectory() as d:
+        log_path, legacy = os.path.join(d, "history.jsonl"), os.path.join(d, "history_named.json")
+        with open(legacy, 'w') as f: json.dump([_record("a", 40.0), _record("b", 55.0), {**_record("x", 70.0), "id": None}], f)
+        log = HistoryLog(log_path, legacy_path=legacy)
+        assert len(log.records()) == 3
+        log.put(_record("c", 90.0))
+        log.update("a", name="Renamed", pinned=True)
+        log.delete("b")
+        after = _reopen(log_path)
+        assert set(after) == set(r["id"] for r in log.records())
+        assert "b" not in after and after["c"]["score"] == 90.0
+        assert after["a"]["name"] == "Renamed" and after["a"]["pinned"] is True
+        assert all(rid for rid in after)  # legacy records without an id got one
+        assert log.columns.n - log.columns.dead == len(after)
+
+def test_torn_tail_keeps_the_next_append():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "history.jsonl")
+        HistoryLog(path).put(_record("a", 40.0))
+        with open(path, 'ab') as f: f.write(b'{"op": "put", "id": "lost", "rec')  # writer died mid-line
+        HistoryLog(path).put(_record("b", 60.0))
+        assert set(_reopen(path)) == {"a", "b"}
+
+def test_compaction_keeps_records_and_respects_the_lock():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "history.jsonl")
+        log = HistoryLog(path, compact_min=10)
+        for i in range(30): log.put(_record(f"r{i}", float(i)))
+        for i in range(20): log.delete(f"r{i}")
+        assert log.lines <= max(log.compact_min, 2 * len(log.index))  # dead lines were compacted away
+        assert set(_reopen(path)) == {f"r{i}" for i in range(20, 30)}
+        open(log.lock_path, 'w').close()
+        try: assert log.compact() is False
+        finally: os.remove(log.lock_path)
+        with open(path, 'ab') as f: f.write(json.dumps({"op": "put", "id": "other", "record": _record("other", 1.0)}).encode() + b"\n")
+        assert log.compact() is False  # another machine appended since our last read
+        assert "other" in _reopen(path)
+        assert log.get("other") is not None and log.compact() is True
+        assert set(_reopen(path)) == {f"r{i}" for i in range(20, 30)} | {"other"}
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"ok  {name}")
@@ -0,0 +1,127 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from plantbot_core import AIModel, INPUT_RANGES, ModelCache, StorageManager
+
+# ==========================================
+# MODEL CACHE: BASE, EXTENSIONS, MANIFESTS
+# ==========================================
+# Follows the app's training job (train, release, Add on a clone, restart) on a small forest.
+# Run with pytest, or directly: python tests/test_model_cache.py
+NEW = {"Hemp": {"whc": 2.8, "solubility": 45}, "Rice": {"whc": 2.0, "solubility": 30}, "Lupin": {"whc": 3.8, "solubility": 65}}
+
+def _model():
+    ai = AIModel()
+    ai.params = {"n_estimators": 10, "random_state": 42}
+    ai.n_samples = 500
+    return ai
+
+def _setup(folder):
+    storage = StorageManager()
+    storage.base_path = folder
+    return ModelCache(os.path.join(folder, "local")), storage.load_ingredients()
+
+def _files(cache, kind):
+    return sorted(n for n in os.listdir(cache.cache_dir()) if n.startswith(kind + "_"))
+
+def _scores(ai, sources, per_source=100):
+    rng = np.random.default_rng(0)
+    n = per_source * len(sources)
+    inputs = {k: rng.uniform(lo, hi, n) for k, (lo, hi) in INPUT_RANGES.items()}
+    inputs.update(whc=np.full(n, 3.0), solubility=np.full(n, 50.0))
+    return ai.predict_many(inputs, [s for s in sources for _ in range(per_source)])
+
+def _extend(cache, ai, db, name):
+    # As the app's training job: extend a clone of the live model, then keep only its arrays
+    db[name] = NEW[name]
+    new_ai = ai.clone()
+    cache.load_or_extend(new_ai, db, name)
+    new_ai.release_estimators()
+    return new_ai
+
+def test_add_writes_one_forest_and_a_manifest():
+    with tempfile.TemporaryDirectory() as d:
+        cache, db = _setup(d)
+        base_db = dict(db)
+        ai = _model()
+        assert cache.load_or_train(ai, db) is False
+        ai.release_estimators()
+        assert _files(cache, "model") == [f"model_{ai.base_key}.pkl"]
+        ai = _extend(cache, ai, db, "Hemp")
+        assert _files(cache, "model") == [f"model_{ai.base_key}.pkl"]  # the base is not rewritten
+        assert _files(cache, "ext") == [f"ext_{ai.ext_keys['Hemp']}.pkl"]
+        assert _files(cache, "manifest") == [f"manifest_{ai.fingerprint(db)}.json"]
+        restarted = _model()
+        assert cache.load_or_train(restarted, db) is True
+        assert restarted.base_key == ai.base_key and restarted.ext_keys == ai.ext_keys
+        assert np.allclose(_scores(restarted, list(db)), _scores(ai, list(db)), rtol=0, atol=1e-9)
+        plain = _model()
+        assert cache.load_or_train(plain, base_db) is True and not plain.added_sources()
+
+def test_released_model_gets_its_estimators_back():
+    with tempfile.TemporaryDirectory() as d:
+        cache, db = _setup(d)
+        ai = _model()
+        cache.load_or_train(ai, db)
+        ai.release_estimators()
+        ai = _extend(cache, ai, db, "Hemp")
+        assert ai.model is None and not ai.extensions
+        full = cache.with_estimators(ai)
+        assert full is not ai and full.model is not None and set(full.extensions) == {"Hemp"}
+        assert ai.model is None  # the live model stays released
+        sources = list(db)
+        assert len(_scores(ai, sources)) > ai.compiled_max_rows  # big enough for sklearn on the clone
+        assert np.allclose(_scores(full, sources), _scores(ai, sources), rtol=0, atol=1e-9)
+
+def test_fold_past_max_extensions_retrains_the_base():
+    with tempfile.TemporaryDirectory() as d:
+        cache, db = _setup(d)
+        ai = _model()
+        ai.max_extensions = 2
+        cache.load_or_train(ai, db)
+        ai.release_estimators()
+        first_base = ai.base_key
+        for name in NEW: ai = _extend(cache, ai, db, name)
+        assert not ai.added_sources() and not ai.ext_keys
+        assert set(NEW) <= set(ai._source_index)
+        assert ai.base_key == ai.fingerprint(db) != first_base
+        assert f"model_{ai.base_key}.pkl" in _files(cache, "model")
+
+def test_evicted_base_is_retrained_not_half_loaded():
+    with tempfile.TemporaryDirectory() as d:
+        cache, db = _setup(d)
+        ai = _model()
+        cache.load_or_train(ai, db)
+        ai.release_estimators()
+        ai = _extend(cache, ai, db, "Hemp")
+        cache.max_bytes = 1
+        os.utime(os.path.join(cache.cache_dir(), f"manifest_{ai.fingerprint(db)}.json"))
+        cache.evict()  # keeps only the newest entry: the manifest, pointing at a missing base
+        assert _files(cache, "model") == [] and _files(cache, "manifest")
+        restarted = _model()
+        assert cache.load_or_train(restarted, db) is False
+        assert restarted.is_trained and "Hemp" in restarted._source_index
+
+def test_cache_stays_off_the_storage_folder():
+    # Pickles on a shared folder would run whatever a colleague's machine planted there
+    with tempfile.TemporaryDirectory() as d:
+        storage = StorageManager()
+        storage.set_mode("CLOUD", os.path.join(d, "share"))
+        cache = ModelCache()
+        assert not os.path.abspath(cache.cache_dir()).startswith(os.path.abspath(storage.base_path))
+        previous = os.environ.get("PLANTBOT_CACHE_DIR")
+        os.environ["PLANTBOT_CACHE_DIR"] = os.path.join(d, "mine")
+        try: assert ModelCache().cache_dir().startswith(os.path.join(d, "mine"))
+        finally:
+            if previous is None: del os.environ["PLANTBOT_CACHE_DIR"]
+            else: os.environ["PLANTBOT_CACHE_DIR"] = previous
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"ok  {name}")